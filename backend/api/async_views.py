@@ -0,0 +1,60 @@
+from functools import partial, update_wrapper
+
+from asgiref.sync import sync_to_async
+from core.async_db import concurrent_queries, database_sync_to_async
+from django.urls import URLPattern
+
+ASYNC_METHODS = ('GET', 'HEAD')
+ASYNC_ROUTES = (
+    'recipes-list', 'recipes-detail', 'tags-list', 'tags-detail',
+    'ingredients-list', 'ingredients-detail', 'users-subscriptions',
+)
+
+
+def render_response(view, request, *args, **kwargs):
+    """Отдаёт готовый ответ, чтобы в event loop не осталось работы с БД.
+
+    Потоковые ответы ASGI-обработчик Django 3.2 читает синхронно в event
+    loop, поэтому представления с ними в ``ASYNC_ROUTES`` не входят.
+    """
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def as_async_view(view):
+    """Async-обёртка над представлением DRF для ASGI.
+
+    GET и HEAD выполняются в пуле потоков ``ASYNC_VIEW_THREADS``: воркер
+    не блокируется на БД и обслуживает другие запросы, а независимые
+    запросы внутри (prefetch рецептов) идут параллельно. Остальные
+    методы работают как обычное синхронное представление.
+    """
+    read = database_sync_to_async(partial(render_response, view))
+    write = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method not in ASYNC_METHODS:
+            return await write(request, *args, **kwargs)
+        token = concurrent_queries.set(True)
+        try:
+            return await read(request, *args, **kwargs)
+        finally:
+            concurrent_queries.reset(token)
+
+    return update_wrapper(async_view, view)
+
+
+def get_async_urlpatterns(urlpatterns, names=ASYNC_ROUTES):
+    """Маршруты с async-обёрткой для ``names``.
+
+    Остальные маршруты остаются на своих местах, иначе ``recipes-detail``
+    перехватил бы ``/recipes/feed/`` и другие действия без pk.
+    """
+    return [
+        URLPattern(pattern.pattern, as_async_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if getattr(pattern, 'name', None) in names else pattern
+        for pattern in urlpatterns
+    ]
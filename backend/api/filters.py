@@ -1,25 +1,81 @@
-from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet, filters)
-from recipes.models import Ingredient, Recipe, Tag
+from core.autocomplete import ingredient_index
+from core.search import search_recipes
+from django.conf import settings
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django_filters.rest_framework import (BooleanFilter, FilterSet,
+                                           NumberFilter, filters)
+from recipes.models import SCORE_ORDERINGS, Ingredient, Recipe, Tag
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (AttributeError, KeyError, ValueError):
+            return settings.INGREDIENT_SEARCH_LIMIT
+        return min(max(limit, 1), settings.INGREDIENT_SEARCH_MAX_LIMIT)
+
+    def filter_name(self, queryset, name, value):
+        limit = self.get_limit()
+        if settings.INGREDIENT_SEARCH_BACKEND == 'database':
+            return queryset.filter(
+                Q(name__istartswith=value) | Q(name__icontains=value)
+            ).annotate(
+                rank=Case(When(name__istartswith=value, then=Value(0)),
+                          default=Value(1), output_field=IntegerField())
+            ).order_by('rank', Length('name'), 'name')[:limit]
+        ids = ingredient_index.search(value, limit)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).order_by(
+            Case(*[When(pk=pk, then=Value(position))
+                   for position, pk in enumerate(ids)],
+                 output_field=IntegerField()))
+
 
 class RecipeFilter(FilterSet):
-    author = CharFilter(field_name='author')
+    author = NumberFilter(field_name='author_id')
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all())
-    is_favorited = BooleanFilter()
-    is_in_shopping_cart = BooleanFilter()
+        queryset=Tag.objects.all(),
+        method='filter_tags')
+    is_favorited = BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in SCORE_ORDERINGS],
+        method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter_by_tags([tag.slug for tag in value])
+
+    def filter_is_favorited(self, queryset, name, value):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        return queryset.filter_favorited(user.id, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        return queryset.filter_in_shopping_cart(user.id, value)
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by_score(value)
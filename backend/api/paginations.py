@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class LimitPageNumberPagination(PageNumberPagination):
@@ -7,3 +16,178 @@ class LimitPageNumberPagination(PageNumberPagination):
     page_size = 8
     page_size_query_param = "limit"
     max_page_size = 24
+
+
+def approximate_count(queryset):
+    """Оценка количества строк по плану запроса без COUNT(*)."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def resolve_field(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def resolve_owner(instance, path):
+    for relation in path.split('__')[:-1]:
+        instance = getattr(instance, relation)
+    return instance
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по ключу сортировки без COUNT и OFFSET.
+
+    Ключ берётся из атрибута ``cursor_ordering`` вьюсета, например
+    ``('-pub_date', '-id')`` для рецептов; поля могут идти через связи
+    (``score__trending``). Последнее поле ключа должно быть уникальным.
+    """
+
+    page_size = LimitPageNumberPagination.page_size
+    page_size_query_param = LimitPageNumberPagination.page_size_query_param
+    max_page_size = LimitPageNumberPagination.max_page_size
+    cursor_query_param = 'cursor'
+    approximate_count_query_param = 'approximate_count'
+    approximate_count_header = 'X-Approximate-Count'
+    default_ordering = ('-id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.approximate_count = None
+        if request.query_params.get(self.approximate_count_query_param):
+            self.approximate_count = self.get_approximate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        results = self.get_page_rows(queryset, position, self.page_size + 1)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_approximate_count(self, queryset):
+        return approximate_count(queryset)
+
+    def get_ordering(self, view):
+        return getattr(view, 'cursor_ordering', self.default_ordering)
+
+    def get_page_rows(self, queryset, position, limit):
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+        return list(queryset[:limit])
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_keyset_filter(self, position):
+        first_field = self.ordering[0]
+        keyset_filter = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{field.lstrip("-")}__{lookup}':
+                             position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                condition &= Q(**{previous.lstrip('-'): value})
+            keyset_filter |= condition
+        bound_lookup = 'lte' if first_field.startswith('-') else 'gte'
+        return Q(**{f'{first_field.lstrip("-")}__{bound_lookup}':
+                    position[0]}) & keyset_filter
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode('ascii')))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                resolve_field(model, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            path = field.lstrip('-')
+            owner = resolve_owner(instance, path)
+            values.append(owner._meta.get_field(
+                path.split('__')[-1]).value_to_string(owner))
+        return b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.approximate_count_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        response = Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+        if self.approximate_count is not None:
+            response[self.approximate_count_header] = self.approximate_count
+        return response
+
+
+class SubscriptionFeedPagination(KeysetPagination):
+    """Курсорная пагинация ленты подписок через ``Recipe.objects.feed``."""
+
+    def get_approximate_count(self, queryset):
+        return approximate_count(
+            queryset.filter_followed(self.request.user.id))
+
+    def get_ordering(self, view):
+        return ('-pub_date', '-id')
+
+    def get_page_rows(self, queryset, position, limit):
+        return queryset.feed(self.request.user.id, limit, position)
+
+
+class FeedPagination(LimitPageNumberPagination):
+    """Постраничная пагинация с курсорным режимом по параметру cursor.
+
+    ``?cursor=`` без значения отдаёт первую страницу в курсорном режиме,
+    ссылка ``next`` в ответе ведёт на следующую. Курсорный режим всегда
+    сортирует по ключу курсора, в том числе результаты ``?search=``:
+    релевантность не поле модели и в курсор не попадает. По
+    релевантности поиск сортирует постраничный режим.
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in (
+                request.query_params):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
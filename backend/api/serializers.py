@@ -1,4 +1,8 @@
-from core.utils import Base64ImageField
+from core.metrics import InstrumentedSerializerMixin
+from core.shopping_cart import invalidate_recipe_shopping_carts
+from core.signals import recipe_save
+from core.utils import Base64ImageField, get_positive_int
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
@@ -9,7 +13,7 @@ from rest_framework import serializers
 User = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(InstrumentedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -20,8 +24,12 @@ class CustomUserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         user = self.context.get('request').user
-        return (user.is_authenticated
-                and obj.following.filter(user=user).exists())
+        if not user.is_authenticated:
+            return False
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
+        return obj.following.filter(user=user).exists()
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -32,27 +40,30 @@ class CustomUserCreateSerializer(UserCreateSerializer):
             'email', 'username', 'password')
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(InstrumentedSerializerMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
 
 
-class SubscriptionRecipeSerializerRead(serializers.ModelSerializer):
-    image = Base64ImageField()
+class SubscriptionRecipeSerializerRead(InstrumentedSerializerMixin,
+                                       serializers.ModelSerializer):
+    image = Base64ImageField(size='thumbnail')
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time',)
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(InstrumentedSerializerMixin,
+                             serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='author.id')
     first_name = serializers.ReadOnlyField(source='author.first_name')
     last_name = serializers.ReadOnlyField(source='author.last_name')
@@ -60,7 +71,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='author.email')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = Follow
@@ -70,31 +81,22 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=self.context.get('request').user,
-            author=obj.author
-        ).exists()
-
-    def validate(self, attrs):
         user = self.context.get('request').user
-        author = self.context.get('author')
-        if author == user:
-            raise serializers.ValidationError(
-                {'error': 'Нельзя подписываться на самого себя'}, code=400)
-        if Follow.objects.filter(user=user, author=author).exists():
-            raise serializers.ValidationError(
-                {'error': 'Вы уже подписаны на данного автоора'}, code=400)
-        return attrs
+        if obj.user_id == user.id:
+            return True
+        return Follow.objects.filter(user=user, author=obj.author).exists()
 
     def get_recipes(self, attrs):
-        author = attrs.author
-        all_recipes = Recipe.objects.filter(author=author)
-        return SubscriptionRecipeSerializerRead(all_recipes, many=True).data
-
-    def get_recipes_count(self, attrs):
-        author = attrs.author
-        all_recipes = Recipe.objects.filter(author=author)
-        return all_recipes.count()
+        author_recipes = self.context.get('author_recipes')
+        if author_recipes is not None:
+            recipes = author_recipes.get(attrs.author_id, [])
+        else:
+            recipes = Recipe.objects.filter(author=attrs.author)
+            recipes_limit = get_positive_int(
+                self.context.get('request').query_params, 'recipes_limit')
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return SubscriptionRecipeSerializerRead(recipes, many=True).data
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
@@ -108,11 +110,13 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(InstrumentedSerializerMixin,
+                           serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer(many=False, read_only=True)
     ingredients = RecipeIngredientSerializer(many=True, read_only=True,
                                              source='recipe_ingredients')
+    image = Base64ImageField(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -122,21 +126,41 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'id', 'tags', 'author', 'ingredients', 'name', 'image', 'text',
             'cooking_time', 'is_favorited', 'is_in_shopping_cart')
 
+    def to_representation(self, recipe):
+        author_is_subscribed = getattr(recipe, 'author_is_subscribed', None)
+        if author_is_subscribed is not None:
+            recipe.author.is_subscribed = author_is_subscribed
+        return super().to_representation(recipe)
+
     def get_is_favorited(self, recipe):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        is_favorited = getattr(recipe, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         return user.favorites.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        is_in_shopping_cart = getattr(recipe, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         return user.shopping_card.filter(recipe=recipe).exists()
 
 
+class CookableRecipeSerializer(RecipeReadSerializer):
+    missing_ingredients_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + (
+            'missing_ingredients_count',)
+
+
 class RecipeIngredientInWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -156,13 +180,27 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                   'cooking_time')
         read_only_fields = ('author',)
 
+    def validate_ingredients(self, ingredients):
+        ingredients_id = [ingredient.get('id') for ingredient in ingredients]
+        existing = Ingredient.objects.in_bulk(ingredients_id)
+        missing = [pk for pk in ingredients_id if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}')
+        return ingredients
+
     def validate(self, attrs):
         ingredients = attrs.get('ingredients', [])
         ingredients_id = []
-        if Recipe.objects.filter(name=attrs.get('name')).exists():
-            raise serializers.ValidationError(
-                {'name': 'Название рецепта должно быть уникальным'}, code=400)
-        if not attrs.get('cooking_time') > 0:
+        if 'name' in attrs:
+            recipes = Recipe.objects.filter(name=attrs['name'])
+            if self.instance is not None:
+                recipes = recipes.exclude(pk=self.instance.pk)
+            if recipes.exists():
+                raise serializers.ValidationError(
+                    {'name': 'Название рецепта должно быть уникальным'},
+                    code=400)
+        if 'cooking_time' in attrs and not attrs['cooking_time'] > 0:
             raise serializers.ValidationError(
                 {"cooking_time": "cooking_time должно быть больше 0"})
         for elem in ingredients:
@@ -178,75 +216,99 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                     {"amount": "значение amount должно быть > 0"})
         return attrs
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.add(*tags)
-        for ingredient in ingredients:
-            RecipeIngredient.objects.create(
-                ingredient=ingredient.get('id'),
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                ingredient_id=ingredient.get('id'),
                 recipe=recipe,
                 amount=ingredient.get('amount'))
+            for ingredient in ingredients)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        current = {recipe_ingredient.ingredient_id: recipe_ingredient
+                   for recipe_ingredient in recipe.recipe_ingredients.all()}
+        amounts = {ingredient.get('id'): ingredient.get('amount')
+                   for ingredient in ingredients}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(ingredient_id=pk, recipe=recipe, amount=amount)
+            for pk, amount in amounts.items() if pk not in current)
+        changed = []
+        for pk, amount in amounts.items():
+            if pk in current and current[pk].amount != amount:
+                current[pk].amount = amount
+                changed.append(current[pk])
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        transaction.on_commit(
+            lambda: invalidate_recipe_shopping_carts(recipe.pk))
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.tags.add(*tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        for field, value in validated_data.items():
-            setattr(instance, field, value)
-        for ingredient in ingredients:
-            RecipeIngredient.objects.create(
-                ingredient=ingredient.get('id'),
-                recipe=instance,
-                amount=ingredient.get('amount'))
-        instance.save()
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        with recipe_save():
+            if tags is not None:
+                instance.tags.set(tags)
+            if ingredients is not None:
+                self.update_ingredients(instance, ingredients)
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save()
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.add_user_annotations(
+            request.user.id).with_read_relations().get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=context).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(InstrumentedSerializerMixin,
+                         serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = serializers.ImageField(source='recipe.image', read_only=True)
+    image = Base64ImageField(source='recipe.image', read_only=True,
+                             size='thumbnail')
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
         model = Favorite
         fields = ('id', 'name', 'cooking_time', 'image')
 
-    def validate(self, attrs):
-        user = self.context.get('request').user
-        recipe = self.context.get('recipe')
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {'error': 'рецепт уже в избранном'}, code=400)
-        return attrs
-
 
-class ShoppingCardSerializer(serializers.ModelSerializer):
+class ShoppingCardSerializer(InstrumentedSerializerMixin,
+                             serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = serializers.ImageField(source='recipe.image', read_only=True)
+    image = Base64ImageField(source='recipe.image', read_only=True,
+                             size='thumbnail')
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
         model = ShoppingCard
         fields = ('id', 'name', 'cooking_time', 'image')
 
-    def validate(self, attrs):
-        user = self.context.get('request').user
-        recipe = self.context.get('recipe')
-        if ShoppingCard.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {'error': 'рецепт уже в списке покупок'}, code=400)
-        return attrs
+
+class IdListSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS)
@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from core.query_budget import reset_caches
+from django.test.utils import override_settings
+from PIL import Image
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, TagRecipe
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+from users.models import User
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-tests',
+    },
+}
+
+
+class FoodgramAPITestCase(APITestCase):
+    """Тесты API с локальным кэшем и временными каталогами медиа и индексов.
+
+    Кэши и индексы в памяти сбрасываются перед каждым тестом.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        image = Path(cls.temp_dir) / 'recipes' / 'test.png'
+        image.parent.mkdir()
+        Image.new('RGB', (8, 8), 'white').save(image)
+        cls.settings_override = override_settings(
+            CACHES=TEST_CACHES,
+            MEDIA_ROOT=cls.temp_dir,
+            SIMILAR_RECIPES_DIR=f'{cls.temp_dir}/similar_recipes',
+            IMAGE_RENDITIONS_SYNC=True,
+            DATABASE_REPLICAS=[],
+            METRICS_DIR=None,
+        )
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        reset_caches()
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', first_name=username, last_name=username)
+
+    @staticmethod
+    def get_client(user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token {}'.format(
+            Token.objects.get_or_create(user=user)[0].key))
+        return client
+
+    @staticmethod
+    def create_catalog(tags=3, ingredients=6):
+        return (
+            [Tag.objects.create(name=f'Тег {index}', color='#ffffff',
+                                slug=f'tag-{index}')
+             for index in range(tags)],
+            [Ingredient.objects.create(name=f'Ингредиент {index}',
+                                       measurement_unit='г')
+             for index in range(ingredients)],
+        )
+
+    @staticmethod
+    def create_recipes(authors, count, tags, ingredients, start=0):
+        """Рецепты по очереди авторов, по два тега и три ингредиента."""
+        recipes = []
+        for index in range(start, start + count):
+            recipe = Recipe.objects.create(
+                author=authors[index % len(authors)], name=f'Рецепт {index}',
+                text='Описание', cooking_time=10,
+                image='recipes/test.png')
+            TagRecipe.objects.bulk_create(
+                TagRecipe(recipe=recipe, tag=tag)
+                for tag in (tags[index % len(tags)],
+                            tags[(index + 1) % len(tags)]))
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=index + 1)
+                for ingredient in ingredients[index % 3:index % 3 + 3])
+            recipes.append(recipe)
+        return recipes
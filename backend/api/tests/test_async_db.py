@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from core.async_db import run_with_connections
+from django.db import connection, connections
+from django.test import TestCase
+
+
+def get_connection():
+    # SQLite в памяти Django никогда не закрывает.
+    connection.is_in_memory_db = lambda: False
+    connection.ensure_connection()
+    return connection.connection
+
+
+class RunWithConnectionsTest(TestCase):
+    def test_thread_reuses_its_connection(self):
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(lambda: executor.submit(
+            connections.close_all).result())
+        first = executor.submit(run_with_connections, get_connection)
+        second = executor.submit(run_with_connections, get_connection)
+        self.assertIsNotNone(first.result())
+        self.assertIs(first.result(), second.result())
@@ -0,0 +1,30 @@
+import asyncio
+
+from api.async_views import ASYNC_ROUTES
+from django.test import SimpleTestCase
+from django.urls import resolve
+
+
+class AsyncUrlpatternsTest(SimpleTestCase):
+    urlconf = 'foodgram.asgi_urls'
+
+    def test_actions_without_pk_are_not_shadowed(self):
+        for path, name in (
+                ('/api/recipes/feed/', 'recipes-feed'),
+                ('/api/recipes/what_can_i_cook/', 'recipes-what-can-i-cook'),
+                ('/api/recipes/download_shopping_cart/',
+                 'recipes-download-shopping-cart'),
+                ('/api/recipes/1/similar/', 'recipes-similar'),
+                ('/api/recipes/1/', 'recipes-detail')):
+            with self.subTest(path=path):
+                self.assertEqual(resolve(path, self.urlconf).url_name, name)
+
+    def test_only_listed_routes_are_async(self):
+        for path in ('/api/recipes/', '/api/recipes/1/', '/api/tags/',
+                     '/api/recipes/download_shopping_cart/',
+                     '/api/recipes/feed/'):
+            match = resolve(path, self.urlconf)
+            with self.subTest(path=path):
+                self.assertEqual(
+                    asyncio.iscoroutinefunction(match.func),
+                    match.url_name in ASYNC_ROUTES)
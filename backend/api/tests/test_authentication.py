@@ -0,0 +1,32 @@
+from api.tests.base import FoodgramAPITestCase
+
+
+class CachedTokenAuthenticationTest(FoodgramAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+    def assert_unauthorized(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_logout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_unauthorized()
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assert_unauthorized()
+
+    def test_password_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': 'password',
+                'new_password': 'Nq8-vT2xLw'})
+        self.assertEqual(response.status_code, 204)
+        self.assert_unauthorized()
@@ -0,0 +1,75 @@
+from unittest import skipIf, skipUnless
+
+from api.tests.base import FoodgramAPITestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Follow, Recipe
+
+
+class SubscriptionFeedTest(FoodgramAPITestCase):
+    """Лента подписок: порядок (-pub_date, -id) и переход по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        authors = [cls.create_user(f'author{index}') for index in range(4)]
+        for author in authors[:2]:
+            Follow.objects.create(user=cls.user, author=author)
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes(authors, 24, tags, ingredients)
+        Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in cls.recipes[4:12]]).update(
+            pub_date=cls.recipes[8].pub_date)
+        cls.expected = list(Recipe.objects.filter(
+            author__in=authors[:2]).order_by('-pub_date', '-id').values_list(
+            'pk', flat=True))
+
+    def walk_feed(self, limit):
+        client = self.get_client(self.user)
+        ids = []
+        url, params = '/api/recipes/feed/', {'limit': limit}
+        while url is not None:
+            response = client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url, params = data['next'], None
+        return ids
+
+    def get_feed_pages(self, limit):
+        pages = []
+        position = None
+        while True:
+            page = Recipe.objects.feed(self.user.pk, limit, position)
+            pages.extend(recipe.pk for recipe in page)
+            if len(page) < limit:
+                return pages
+            position = (page[-1].pub_date, page[-1].pk)
+
+    def test_feed_follows_cursor(self):
+        self.assertEqual(len(self.expected), 12)
+        for limit in (1, 5, 24):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk_feed(limit), self.expected)
+
+    def test_feed_requires_authentication(self):
+        self.assertEqual(
+            self.client.get('/api/recipes/feed/').status_code, 401)
+
+    @skipIf(connection.vendor == 'postgresql',
+            'Запасной путь работает только вне PostgreSQL')
+    def test_fallback_feed(self):
+        with CaptureQueriesContext(connection) as queries:
+            pages = self.get_feed_pages(5)
+        self.assertEqual(pages, self.expected)
+        self.assertFalse(any('LATERAL' in query['sql']
+                             for query in queries.captured_queries))
+
+    @skipUnless(connection.vendor == 'postgresql',
+                'LATERAL проверяется только в PostgreSQL')
+    def test_lateral_feed(self):
+        with CaptureQueriesContext(connection) as queries:
+            pages = self.get_feed_pages(5)
+        self.assertEqual(pages, self.expected)
+        self.assertTrue(any('LATERAL' in query['sql']
+                            for query in queries.captured_queries))
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from api.tests.base import FoodgramAPITestCase
+from api.views import RecipeViewSet
+from recipes.models import Favorite, Follow, ShoppingCard
+
+
+class RecipeFragmentsTest(FoodgramAPITestCase):
+    """Склеенный из фрагментов ответ совпадает с обычной сериализацией."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [cls.create_user(f'reader{index}') for index in range(2)]
+        authors = [cls.create_user(f'author{index}') for index in range(3)]
+        tags, ingredients = cls.create_catalog()
+        recipes = cls.create_recipes(authors, 9, tags, ingredients)
+        first, second = cls.users
+        Follow.objects.create(user=first, author=authors[0])
+        Follow.objects.create(user=second, author=authors[1])
+        Favorite.objects.bulk_create(
+            Favorite(user=first, recipe=recipe) for recipe in recipes[::2])
+        ShoppingCard.objects.bulk_create(
+            ShoppingCard(user=first, recipe=recipe) for recipe in recipes[:4])
+        Favorite.objects.create(user=second, recipe=recipes[1])
+
+    def get(self, client, url, params, use_fragments):
+        with mock.patch.object(
+                RecipeViewSet, 'use_fragments',
+                lambda view: use_fragments and view.action in (
+                    'list', 'feed')):
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_fragments_match_serializer(self):
+        requests = (
+            ('/api/recipes/', {'limit': 6}),
+            ('/api/recipes/', {'limit': 6, 'page': 2}),
+            ('/api/recipes/', {'cursor': '', 'limit': 4}),
+            ('/api/recipes/', {'image_size': 'original'}),
+            ('/api/recipes/feed/', {'limit': 2}),
+        )
+        for user in self.users:
+            client = self.get_client(user)
+            for url, params in requests:
+                with self.subTest(user=user.username, url=url, **params):
+                    expected = self.get(client, url, params, False)
+                    self.assertIn(b'":true', expected)
+                    for _ in range(2):
+                        self.assertEqual(
+                            self.get(client, url, params, True), expected)
@@ -0,0 +1,69 @@
+import base64
+import io
+from unittest import mock
+
+from api.tests.base import FoodgramAPITestCase
+from core.images import (decode_base64_image, generate_renditions,
+                         get_rendition_name)
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from recipes.models import Recipe
+
+
+def save_image(name, color, image_format):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color).save(buffer, image_format)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+class RenditionsTest(FoodgramAPITestCase):
+    def test_same_stem_different_extension(self):
+        png = save_image('recipes/photo.png', 'red', 'PNG')
+        jpeg = save_image('recipes/photo.jpeg', 'blue', 'JPEG')
+        generate_renditions(png)
+        generate_renditions(jpeg)
+        for size in ('thumbnail', 'card', 'webp'):
+            with self.subTest(size=size):
+                self.assertNotEqual(get_rendition_name(png, size),
+                                    get_rendition_name(jpeg, size))
+                for name, channel in ((png, 0), (jpeg, 2)):
+                    with default_storage.open(
+                            get_rendition_name(name, size)) as rendition:
+                        pixel = Image.open(rendition).convert(
+                            'RGB').getpixel((0, 0))
+                    self.assertGreater(pixel[channel], 200)
+
+
+class Base64UploadTest(FoodgramAPITestCase):
+    def test_uploaded_file_is_closed(self):
+        author = self.create_user('author')
+        tags, ingredients = self.create_catalog()
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 32), 'green').save(buffer, 'PNG')
+        decoded = []
+
+        def decode(data):
+            decoded.append(decode_base64_image(data))
+            return decoded[-1]
+
+        payload = {
+            'name': 'С картинкой',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'tags': [tags[0].pk],
+            'ingredients': [{'id': ingredients[0].pk, 'amount': 1}],
+            'image': 'data:image/png;base64,'
+                     + base64.b64encode(buffer.getvalue()).decode(),
+        }
+        with mock.patch('core.utils.decode_base64_image', decode):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.get_client(author).post(
+                    '/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(decoded), 1)
+        self.assertTrue(decoded[0].closed)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        self.assertTrue(default_storage.exists(
+            get_rendition_name(recipe.image.name, 'card')))
@@ -0,0 +1,63 @@
+import os
+import runpy
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from api.tests.base import FoodgramAPITestCase
+from django.conf import settings
+from django.test.utils import override_settings
+
+METRICS_URL = '/api/metrics/'
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsAccessTest(FoodgramAPITestCase):
+    def test_anonymous_is_denied(self):
+        self.assertIn(self.client.get(METRICS_URL).status_code, (401, 403))
+
+    def test_regular_user_is_denied(self):
+        client = self.get_client(self.create_user('reader'))
+        self.assertEqual(client.get(METRICS_URL).status_code, 403)
+
+    def test_wrong_token_is_denied(self):
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertIn(response.status_code, (401, 403))
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_token_is_required_in_settings(self):
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer None')
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_token(self):
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE foodgram_requests_total counter',
+                      response.content)
+
+    def test_staff_user(self):
+        user = self.create_user('admin')
+        user.is_staff = True
+        user.save()
+        self.assertEqual(
+            self.get_client(user).get(METRICS_URL).status_code, 200)
+
+
+class GunicornChildExitTest(FoodgramAPITestCase):
+    def test_removes_worker_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.dict(os.environ, {'METRICS_DIR': directory}):
+                config = runpy.run_path(
+                    str(Path(settings.BASE_DIR) / 'gunicorn.conf.py'))
+            snapshots = [Path(directory) / f'{pid}.json'
+                         for pid in (101, 102)]
+            for snapshot in snapshots:
+                snapshot.write_text('{}')
+            config['child_exit'](None, SimpleNamespace(pid=101))
+            config['child_exit'](None, SimpleNamespace(pid=101))
+            self.assertEqual(list(Path(directory).iterdir()),
+                             [snapshots[1]])
@@ -0,0 +1,79 @@
+from api.tests.base import FoodgramAPITestCase
+from api.urls import router_v1
+from core.query_budget import (get_route_url, iter_get_routes, query_budget,
+                               reset_caches)
+from recipes.models import Favorite, Follow, Recipe, ShoppingCard
+from users.models import User
+
+PAGE_SIZES = (1, 24)
+
+
+class QueryBudgetsTest(FoodgramAPITestCase):
+    """Бюджеты ``query_budgets`` для всех GET-маршрутов router_v1.
+
+    Число запросов каждого маршрута сравнивается на двух объёмах данных
+    и на разных размерах страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.authors = [cls.create_user(f'author{index}')
+                       for index in range(6)]
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, author=author) for author in cls.authors)
+        cls.tags, cls.ingredients = cls.create_catalog()
+        cls.add_recipes(10)
+
+    @classmethod
+    def add_recipes(cls, count):
+        recipes = cls.create_recipes(
+            cls.authors, count, cls.tags, cls.ingredients,
+            start=Recipe.objects.count())
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2])
+        ShoppingCard.objects.bulk_create(
+            ShoppingCard(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3])
+
+    def get_instance(self, viewset):
+        model = viewset.queryset.model
+        if model is User:
+            return self.user
+        return model.objects.order_by('pk').first()
+
+    def measure(self, client):
+        """Число запросов по (маршрут, размер страницы)."""
+        counts = {}
+        for viewset, action, url_name, detail in iter_get_routes(router_v1):
+            label = f'{viewset.__name__}.{action}'
+            budget = getattr(viewset, 'query_budgets', {}).get(action)
+            self.assertIsNotNone(budget, f'{label}: бюджет не задан')
+            url = get_route_url(
+                viewset, url_name, detail, self.get_instance(viewset))
+            for page_size in (None,) if detail else PAGE_SIZES:
+                params = budget.get_params()
+                if page_size is not None:
+                    params['limit'] = page_size
+                reset_caches()
+                with self.subTest(route=label, limit=page_size):
+                    with query_budget(budget.max_queries,
+                                      budget.allow_duplicates) as captured:
+                        response = client.get(url, params)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    self.assertLess(response.status_code, 400)
+                counts[label, page_size] = len(captured)
+        return counts
+
+    def test_budgets(self):
+        client = self.get_client(self.user)
+        small = self.measure(client)
+        self.add_recipes(40)
+        large = self.measure(client)
+        for (label, page_size), count in small.items():
+            with self.subTest(route=label, limit=page_size):
+                self.assertEqual(large[label, page_size], count)
+            if page_size == PAGE_SIZES[-1]:
+                self.assertEqual(small[label, PAGE_SIZES[0]], count,
+                                 f'{label}: запросы зависят от страницы')
@@ -0,0 +1,67 @@
+from unittest import skipUnless
+
+from api.filters import RecipeFilter
+from api.tests.base import FoodgramAPITestCase
+from django.db import connection
+from recipes.models import Favorite, Recipe, ShoppingCard
+from rest_framework.test import APIRequestFactory
+
+RELATION_TABLES = (Favorite._meta.db_table, ShoppingCard._meta.db_table)
+
+
+class RecipeFilterTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.other = cls.create_user('other')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes(
+            [cls.other], 20, tags, ingredients)
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe)
+            for user in (cls.user, cls.other) for recipe in cls.recipes[:5])
+        ShoppingCard.objects.bulk_create(
+            ShoppingCard(user=cls.user, recipe=recipe)
+            for recipe in cls.recipes[3:8])
+
+    def filter_recipes(self, params):
+        request = APIRequestFactory().get('/api/recipes/', params)
+        request.user = self.user
+        return RecipeFilter(
+            request.GET, queryset=Recipe.objects.all(), request=request).qs
+
+    def get_ids(self, params):
+        return set(self.filter_recipes(params).values_list('pk', flat=True))
+
+    def test_relation_filters(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        self.assertEqual(self.get_ids({'is_favorited': 1}), set(ids[:5]))
+        self.assertEqual(self.get_ids({'is_favorited': 0}), set(ids[5:]))
+        self.assertEqual(self.get_ids({'is_in_shopping_cart': 1}),
+                         set(ids[3:8]))
+        self.assertEqual(
+            self.get_ids({'is_favorited': 1, 'is_in_shopping_cart': 1}),
+            set(ids[3:5]))
+
+    def test_tags_filter_has_no_duplicates(self):
+        recipes = self.filter_recipes({'tags': ['tag-0', 'tag-1']})
+        self.assertEqual(recipes.count(), len(set(recipes)))
+
+    @skipUnless(connection.vendor == 'postgresql',
+                'EXPLAIN проверяется только в PostgreSQL')
+    def test_relation_filters_use_indexes(self):
+        """Без seq scan по избранному и спискам покупок при его запрете.
+
+        На тестовых объёмах планировщик и так выбрал бы seq scan, поэтому
+        он запрещается: если индекса нет, PostgreSQL всё равно сканирует
+        таблицу целиком.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for params in ({'is_favorited': 1}, {'is_favorited': 0},
+                       {'is_in_shopping_cart': 1},
+                       {'is_in_shopping_cart': 0}):
+            with self.subTest(params=params):
+                plan = self.filter_recipes(params).explain()
+                for table in RELATION_TABLES:
+                    self.assertNotIn(f'Seq Scan on {table}', plan)
@@ -0,0 +1,102 @@
+from api.tests.base import FoodgramAPITestCase
+from core.query_budget import reset_caches
+from recipes.models import Follow, Recipe
+
+
+class RecipeQueriesTest(FoodgramAPITestCase):
+    """Число запросов списка и карточки рецепта не зависит от данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        authors = [cls.create_user(f'author{index}') for index in range(4)]
+        Follow.objects.create(user=cls.user, author=authors[0])
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes(authors, 30, tags, ingredients)
+
+    def test_list(self):
+        for client, queries in ((self.client, 4),
+                                (self.get_client(self.user), 5)):
+            with self.subTest(authenticated=client is not self.client):
+                for limit in (1, 24):
+                    reset_caches()
+                    with self.assertNumQueries(queries):
+                        response = client.get('/api/recipes/',
+                                              {'limit': limit})
+                    results = response.json()['results']
+                    self.assertEqual(len(results), limit)
+                    self.assertEqual(len(results[0]['ingredients']), 3)
+
+    def test_retrieve(self):
+        for client, queries in ((self.client, 3),
+                                (self.get_client(self.user), 4)):
+            with self.subTest(authenticated=client is not self.client):
+                for recipe in (self.recipes[0], self.recipes[-1]):
+                    reset_caches()
+                    with self.assertNumQueries(queries):
+                        response = client.get(f'/api/recipes/{recipe.pk}/')
+                    data = response.json()
+                    self.assertEqual(data['id'], recipe.pk)
+                    self.assertEqual(len(data['tags']), 2)
+
+
+class KeysetPaginationTest(FoodgramAPITestCase):
+    """Курсорный режим списка рецептов: ?cursor= и ссылка next."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes([author], 20, tags, ingredients)
+
+    def walk(self, limit, **params):
+        ids = []
+        url = '/api/recipes/'
+        params = {'cursor': '', 'limit': limit, **params}
+        while url is not None:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), limit)
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url, params = data['next'], None
+        return ids
+
+    def test_next_links_cover_all_recipes_in_order(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(7), expected)
+        self.assertEqual(self.walk(20), expected)
+
+    def test_equal_pub_date_is_ordered_by_id(self):
+        Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in self.recipes[5:15]]).update(
+            pub_date=self.recipes[10].pub_date)
+        ids = self.walk(3)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('pk', flat=True)))
+
+    def test_response_has_no_count_and_last_page_no_next(self):
+        data = self.client.get(
+            '/api/recipes/', {'cursor': '', 'limit': 20}).json()
+        self.assertEqual(set(data), {'next', 'results'})
+        self.assertIsNone(data['next'])
+
+    def test_approximate_count(self):
+        response = self.client.get('/api/recipes/', {
+            'cursor': '', 'limit': 5, 'approximate_count': 1})
+        self.assertEqual(response['X-Approximate-Count'], '20')
+        self.assertNotIn('approximate_count', response.json()['next'])
+        response = self.client.get('/api/recipes/', {
+            'cursor': '', 'limit': 5, 'approximate_count': 1,
+            'author': self.recipes[0].author_id + 1})
+        self.assertEqual(response['X-Approximate-Count'], '0')
+        self.assertNotIn('X-Approximate-Count', self.client.get(
+            '/api/recipes/', {'cursor': ''}))
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-base64', 'WzFd'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(
+                    '/api/recipes/', {'cursor': cursor}).status_code, 404)
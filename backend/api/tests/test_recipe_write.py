@@ -0,0 +1,78 @@
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+class RecipePartialUpdateTest(FoodgramAPITestCase):
+    """PATCH меняет только переданные поля рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.tags, cls.ingredients = cls.create_catalog()
+        cls.recipe = cls.create_recipes(
+            [cls.author], 1, cls.tags, cls.ingredients)[0]
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        self.author_client = self.get_client(self.author)
+
+    def test_patch_without_cooking_time(self):
+        response = self.author_client.patch(
+            self.url, {'name': 'Новое название'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.assertEqual(response.data['cooking_time'], 10)
+        self.assertEqual(len(response.data['ingredients']), 3)
+
+    def test_patch_cooking_time_only(self):
+        response = self.author_client.patch(
+            self.url, {'cooking_time': 25}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.cooking_time, 25)
+        self.assertEqual(self.recipe.name, 'Рецепт 0')
+
+    def test_patch_invalid_cooking_time(self):
+        response = self.author_client.patch(
+            self.url, {'cooking_time': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cooking_time', response.data)
+
+    def test_patch_ingredients_only(self):
+        kept, changed, _ = self.recipe.recipe_ingredients.order_by(
+            'ingredient_id')
+        added = self.ingredients[-1]
+        response = self.author_client.patch(self.url, {'ingredients': [
+            {'id': kept.ingredient_id, 'amount': kept.amount},
+            {'id': changed.ingredient_id, 'amount': 50},
+            {'id': added.pk, 'amount': 7},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(RecipeIngredient.objects.filter(
+                recipe=self.recipe).values_list('ingredient_id', 'amount')),
+            {kept.ingredient_id: kept.amount, changed.ingredient_id: 50,
+             added.pk: 7})
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).tags.count(), 2)
+
+    def test_replacing_ingredients_takes_fixed_queries(self):
+        small, large = self.create_recipes(
+            [self.author], 2, self.tags, self.ingredients, start=1)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=large, ingredient=ingredient, amount=1)
+            for ingredient in (self.ingredients[0], self.ingredients[5]))
+        added = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.author_client.get('/api/users/me/')
+        for recipe in (small, large):
+            with self.subTest(ingredients=recipe.recipe_ingredients.count()):
+                with self.assertNumQueries(13):
+                    response = self.author_client.patch(
+                        f'/api/recipes/{recipe.pk}/',
+                        {'ingredients': [{'id': added.pk, 'amount': 5}]},
+                        format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    list(recipe.recipe_ingredients.values_list(
+                        'ingredient_id', flat=True)), [added.pk])
@@ -0,0 +1,87 @@
+from api.tests.base import FoodgramAPITestCase
+from core.shopping_cart import get_version_key
+from django.core.cache import cache
+from django.db import connection
+from recipes.models import Favorite, Recipe, ShoppingCard
+
+
+class BulkRelationsTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        author = cls.create_user('author')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes([author], 3, tags, ingredients)
+
+    def setUp(self):
+        super().setUp()
+        self.user_client = self.get_client(self.user)
+
+    def get_counts(self, field):
+        return dict(Recipe.objects.values_list('pk', field))
+
+    def test_bulk_add_and_remove(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        ShoppingCard.objects.create(user=self.user, recipe_id=first)
+        response = self.user_client.post(
+            '/api/recipes/shopping_cart/',
+            {'ids': [first, second, 10 ** 6]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': first, 'status': 'exists'},
+            {'id': second, 'status': 'created'},
+            {'id': 10 ** 6, 'status': 'not_found'},
+        ])
+        self.assertEqual(self.get_counts('in_carts_count'),
+                         {first: 1, second: 1, third: 0})
+        response = self.user_client.delete(
+            '/api/recipes/shopping_cart/', {'ids': [second, third]},
+            format='json')
+        self.assertEqual(response.data['results'], [
+            {'id': second, 'status': 'deleted'},
+            {'id': third, 'status': 'absent'},
+        ])
+        self.assertEqual(self.get_counts('in_carts_count'),
+                         {first: 1, second: 0, third: 0})
+
+    def test_concurrent_insert_is_not_counted(self):
+        """Строка, вставленная другим запросом перед INSERT, не считается."""
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        table = Favorite._meta.db_table
+        inserted = []
+
+        def insert_concurrently(execute, sql, params, many, context):
+            if sql.startswith(f'INSERT INTO "{table}"') and not inserted:
+                inserted.append(first)
+                Favorite.objects.bulk_create(
+                    [Favorite(user=self.user, recipe_id=first)])
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(insert_concurrently):
+            response = self.user_client.post(
+                '/api/recipes/favorite/', {'ids': [first, second]},
+                format='json')
+        self.assertEqual(response.data['results'], [
+            {'id': first, 'status': 'exists'},
+            {'id': second, 'status': 'created'},
+        ])
+        self.assertEqual(self.get_counts('favorites_count'),
+                         {first: 0, second: 1, third: 0})
+
+    def test_shopping_cart_is_invalidated_after_commit(self):
+        recipe_id = self.recipes[0].pk
+        key = get_version_key(self.user.pk)
+        for url, data in (
+                ('/api/recipes/shopping_cart/', {'ids': [recipe_id]}),
+                (f'/api/recipes/{recipe_id}/shopping_cart/', None)):
+            ShoppingCard.objects.filter(user=self.user).delete()
+            cache.set(key, 1, None)
+            with self.subTest(url=url):
+                with self.captureOnCommitCallbacks() as callbacks:
+                    response = self.user_client.post(url, data,
+                                                     format='json')
+                self.assertIn(response.status_code, (200, 201))
+                self.assertEqual(cache.get(key), 1)
+                for callback in callbacks:
+                    callback()
+                self.assertNotEqual(cache.get(key), 1)
@@ -0,0 +1,66 @@
+from api.tests.base import FoodgramAPITestCase
+
+
+class RecipeResponseCacheTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes([author], 12, tags, ingredients)
+
+    def get_page(self, params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, [recipe['id'] for recipe in response.json()[
+            'results']]
+
+    def test_pages_are_cached_separately(self):
+        third, third_ids = self.get_page({'page': 3, 'limit': 5})
+        first, first_ids = self.get_page({'page': 1, 'limit': 5})
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(len(first_ids), 5)
+        self.assertEqual(len(third_ids), 2)
+        self.assertFalse(set(first_ids) & set(third_ids))
+        cached, cached_ids = self.get_page({'limit': 5})
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached_ids, first_ids)
+        cached, cached_ids = self.get_page({'limit': 5, 'page': 3})
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached_ids, third_ids)
+
+    def test_if_none_match_returns_not_modified(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+        for _ in range(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['X-Cache'], 'HIT')
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_after_recipe_update(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.pk}/'
+        etag = self.client.get(url)['ETag']
+        list_etag = self.get_page({'limit': 5})[0]['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.get_client(recipe.author).patch(
+                url, {'name': 'Новое название'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], 'Новое название')
+        self.assertNotEqual(self.get_page({'limit': 5})[0]['ETag'],
+                            list_etag)
+
+    def test_authenticated_responses_are_not_cached(self):
+        client = self.get_client(self.recipes[0].author)
+        response = client.get(f'/api/recipes/{self.recipes[0].pk}/')
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('X-Cache', response)
@@ -0,0 +1,61 @@
+from unittest import skipIf
+
+from api.tests.base import FoodgramAPITestCase
+from core.search import update_search_vectors
+from django.db import connection
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+class RecipeSearchTest(FoodgramAPITestCase):
+    """Поиск ?search=: tsvector в PostgreSQL, индекс в памяти в остальных.
+
+    Постраничный режим сортирует по релевантности, курсорный — по ключу
+    курсора (-pub_date, -id).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        tags, ingredients = cls.create_catalog()
+        cls.name_match, cls.text_match, cls.ingredient_match, _ = (
+            cls.create_recipes([author], 4, tags, ingredients))
+        Recipe.objects.filter(pk=cls.name_match.pk).update(name='Борщ')
+        Recipe.objects.filter(pk=cls.text_match.pk).update(
+            name='Салат', text='Почти борщ')
+        RecipeIngredient.objects.create(
+            recipe=cls.ingredient_match, amount=1,
+            ingredient=Ingredient.objects.create(
+                name='Борщ (заправка)', measurement_unit='г'))
+        update_search_vectors(*Recipe.objects.values_list('pk', flat=True))
+
+    def search(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_results_are_ranked_by_field(self):
+        self.assertEqual(self.search(search='борщ'), [
+            self.name_match.pk, self.text_match.pk, self.ingredient_match.pk])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search(search='борщ салат'),
+                         [self.text_match.pk])
+        self.assertEqual(self.search(search='борщ пельмени'), [])
+
+    def test_cursor_mode_orders_by_date(self):
+        self.assertEqual(self.search(search='борщ', cursor=''), [
+            self.ingredient_match.pk, self.text_match.pk, self.name_match.pk])
+
+    def test_new_recipe_is_found_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.name_match.author, name='Борщ зелёный',
+                text='Описание', cooking_time=5, image='recipes/test.png')
+        self.assertIn(recipe.pk, self.search(search='зелёный'))
+
+    @skipIf(connection.vendor == 'postgresql',
+            'Индекс в памяти работает только вне PostgreSQL')
+    def test_index_matches_prefixes(self):
+        self.assertEqual(self.search(search='БОР'), [
+            self.name_match.pk, self.text_match.pk, self.ingredient_match.pk])
+        self.assertEqual(self.search(search='ёжик'), [])
@@ -0,0 +1,97 @@
+import csv
+import io
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import RecipeIngredient, ShoppingCard
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingCartExportTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('buyer')
+        author = cls.create_user('author')
+        cls.tags, cls.ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes(
+            [author], 3, cls.tags, cls.ingredients)
+        ShoppingCard.objects.bulk_create(
+            ShoppingCard(user=cls.user, recipe=recipe)
+            for recipe in cls.recipes[:2])
+
+    def setUp(self):
+        super().setUp()
+        self.user_client = self.get_client(self.user)
+
+    def download(self, file_format='txt'):
+        response = self.user_client.get(URL, {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt(self):
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename=cart.txt')
+        self.assertEqual(content.decode().splitlines(), [
+            'Ингредиент 0 1 г', 'Ингредиент 1 3 г', 'Ингредиент 2 3 г',
+            'Ингредиент 3 2 г'])
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename=cart.csv')
+        self.assertEqual(list(csv.reader(io.StringIO(content.decode()))), [
+            ['Ингредиент', 'Количество', 'Единица измерения'],
+            ['Ингредиент 0', '1', 'г'], ['Ингредиент 1', '3', 'г'],
+            ['Ингредиент 2', '3', 'г'], ['Ингредиент 3', '2', 'г']])
+
+    def test_pdf(self):
+        response, content = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_unknown_format(self):
+        response = self.user_client.get(URL, {'file_format': 'xls'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_repeated_download_is_cached(self):
+        _, content = self.download()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.download()[1], content)
+
+    def test_cart_change_resets_cache(self):
+        self.download()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_client.post('/api/recipes/shopping_cart/', {
+                'ids': [self.recipes[2].pk]}, format='json')
+        self.assertIn('Ингредиент 4 3 г', self.download()[1].decode())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_client.delete(
+                f'/api/recipes/{self.recipes[0].pk}/shopping_cart/')
+        self.assertNotIn('Ингредиент 0', self.download()[1].decode())
+
+    def test_recipe_ingredients_change_resets_cache(self):
+        self.download()
+        recipe_ingredient = RecipeIngredient.objects.get(
+            recipe=self.recipes[0], ingredient=self.ingredients[0])
+        recipe_ingredient.amount = 10
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_ingredient.save()
+        self.assertIn('Ингредиент 0 10 г', self.download()[1].decode())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.get_client(self.recipes[1].author).patch(
+                f'/api/recipes/{self.recipes[1].pk}/',
+                {'ingredients': [{'id': self.ingredients[5].pk,
+                                  'amount': 4}]}, format='json')
+        self.assertEqual(self.download()[1].decode().splitlines(), [
+            'Ингредиент 0 10 г', 'Ингредиент 1 1 г', 'Ингредиент 2 1 г',
+            'Ингредиент 5 4 г'])
+
+    def test_ingredient_rename_resets_cache(self):
+        self.download()
+        ingredient = self.ingredients[0]
+        ingredient.name = 'Мука'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        self.assertIn('Мука 1 г', self.download()[1].decode())
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import numpy as np
+from api.tests.base import FoodgramAPITestCase
+from core.similar import INDEX_FILE, SimilarRecipesBuilder
+from django.conf import settings
+from django.test.utils import override_settings
+from django.utils import timezone
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+@override_settings(SIMILAR_RECIPES_OVERLAP=0)
+class SimilarRecipesTest(FoodgramAPITestCase):
+    def setUp(self):
+        super().setUp()
+        author = self.create_user('author')
+        tags, ingredients = self.create_catalog()
+        self.recipes = self.create_recipes([author], 12, tags, ingredients)
+        Recipe.objects.update(updated=timezone.now() - timedelta(days=1))
+        SimilarRecipesBuilder().build()
+
+    def get_indexed_neighbors(self):
+        index = np.load(f'{settings.SIMILAR_RECIPES_DIR}/{INDEX_FILE}')
+        return {int(row['recipe_id']): {int(pk) for pk in row['neighbors']
+                                        if pk != -1}
+                for row in index}
+
+    def test_invalid_id(self):
+        for pk in ('abc', '0', str(self.recipes[-1].pk + 100)):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/recipes/{pk}/similar/')
+                self.assertEqual(response.status_code, 404)
+
+    def test_similar(self):
+        recipe = self.recipes[0]
+        response = self.client.get(f'/api/recipes/{recipe.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data)
+        self.assertNotIn(recipe.pk, [item['id'] for item in response.data])
+
+    def test_update_removes_stale_neighbors(self):
+        changed, deleted = self.recipes[0], self.recipes[1]
+        neighbors = self.get_indexed_neighbors()
+        self.assertTrue(any(changed.pk in found and deleted.pk in found
+                            for found in neighbors.values()))
+        changed.tags.clear()
+        RecipeIngredient.objects.filter(recipe=changed).delete()
+        RecipeIngredient.objects.create(
+            recipe=changed, amount=1, ingredient=Ingredient.objects.create(
+                name='Уникальный', measurement_unit='г'))
+        changed.save()
+        deleted.delete()
+        SimilarRecipesBuilder().update()
+        neighbors = self.get_indexed_neighbors()
+        self.assertNotIn(deleted.pk, neighbors)
+        self.assertEqual(neighbors[changed.pk], set())
+        for found in neighbors.values():
+            self.assertNotIn(changed.pk, found)
+            self.assertNotIn(deleted.pk, found)
@@ -0,0 +1,47 @@
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Follow
+
+
+class SubscriptionsTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = {}
+        start = 0
+        for username, count in (('empty', 0), ('few', 2), ('many', 5)):
+            author = cls.create_user(username)
+            Follow.objects.create(user=cls.user, author=author)
+            cls.recipes[username] = [
+                recipe.pk for recipe in cls.create_recipes(
+                    [author], count, tags, ingredients, start)]
+            start += count
+
+    def setUp(self):
+        super().setUp()
+        self.user_client = self.get_client(self.user)
+
+    def get_subscriptions(self, **params):
+        response = self.user_client.get('/api/users/subscriptions/', params)
+        self.assertEqual(response.status_code, 200)
+        return {author['username']: author
+                for author in response.json()['results']}
+
+    def test_recipes_limit_caps_recipes_per_author(self):
+        authors = self.get_subscriptions(recipes_limit=3)
+        for username, recipe_ids in self.recipes.items():
+            with self.subTest(author=username):
+                self.assertEqual(
+                    [recipe['id'] for recipe in authors[username]['recipes']],
+                    recipe_ids[::-1][:3])
+                self.assertEqual(authors[username]['recipes_count'],
+                                 len(recipe_ids))
+
+    def test_invalid_recipes_limit_returns_all_recipes(self):
+        for value in ('abc', '0', '-2', ''):
+            with self.subTest(recipes_limit=value):
+                authors = self.get_subscriptions(recipes_limit=value)
+                self.assertEqual(
+                    {username: len(author['recipes'])
+                     for username, author in authors.items()},
+                    {'empty': 0, 'few': 2, 'many': 5})
@@ -1,5 +1,6 @@
 from api.views import (CustomUserViewSet, IngredientListRetrieveViewSet,
                        RecipeViewSet, TagListRetrieveViewSet)
+from core.metrics import metrics_view
 from django.urls import include, path
 from rest_framework import routers
 
@@ -12,5 +13,6 @@ router_v1.register('recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include(router_v1.urls), name='users-v1'),
 ]
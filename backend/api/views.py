@@ -1,19 +1,35 @@
+from collections import defaultdict
+from pathlib import Path
+
 from api.filters import IngredientFilter, RecipeFilter
+from api.paginations import FeedPagination, SubscriptionFeedPagination
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (CustomUserSerializer, FavoriteSerializer,
+from api.serializers import (CookableRecipeSerializer, CustomUserSerializer,
+                             FavoriteSerializer, IdListSerializer,
                              IngredientSerializer, RecipeReadSerializer,
                              RecipeWriteSerializer, ShoppingCardSerializer,
+                             SubscriptionRecipeSerializerRead,
                              SubscriptionSerializer, TagSerializer)
-from core.utils import ListRetrieveModelMixin, get_product_list
+from core.async_db import prefetch_concurrently
+from core.catalog_cache import CachedCatalogMixin
+from core.fragments import render_page, render_recipes
+from core.pantry import pantry_index
+from core.query_budget import QueryBudget
+from core.relations import (ABSENT, DELETED, EXISTS, favorites, shopping_cart,
+                            subscriptions)
+from core.response_cache import CachedResponseMixin
+from core.shopping_cart import EXPORT_FORMATS, iter_products
+from core.similar import similar_index
+from core.utils import ListRetrieveModelMixin, get_positive_int
 from django.conf import settings
-from django.db.models import Value
+from django.db.models import Exists, OuterRef, Value
 from django.db.models.fields import BooleanField
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCard,
-                            Tag)
+from recipes.models import (SCORE_ORDERINGS, Follow, Ingredient, Recipe, Tag,
+                            get_read_prefetches)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -21,10 +37,48 @@ from rest_framework.response import Response
 from users.models import User
 
 
+def get_object_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def get_pantry_params():
+    return {'ingredients': ','.join(map(str, Ingredient.objects.order_by(
+        'pk').values_list('pk', flat=True)[:10]))}
+
+
+def change_relations(request, relation):
+    serializer = IdListSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    if request.method == 'POST':
+        results = relation.add(request.user, ids)
+    else:
+        results = relation.remove(request.user, ids)
+    return Response({'results': results})
+
+
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     http_method_names = ['get', 'post', 'delete']
+    pagination_class = FeedPagination
+    cursor_ordering = ('-id',)
+    query_budgets = {
+        'list': QueryBudget(3),
+        'retrieve': QueryBudget(2),
+        'me': QueryBudget(2),
+        'subscriptions': QueryBudget(4),
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_authenticated:
+            return queryset
+        return queryset.annotate(is_subscribed=Exists(Follow.objects.filter(
+            user_id=self.request.user.id, author_id=OuterRef('pk'))))
 
     @action(
         detail=False,
@@ -43,12 +97,20 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        subscriptions = Follow.objects.filter(user=user)
+        subscriptions = Follow.objects.filter(user=user).select_related(
+            'author').order_by('-id')
         pages = self.paginate_queryset(subscriptions)
+        recipes_limit = get_positive_int(request.query_params,
+                                         'recipes_limit')
+        author_recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_authors(
+                [follow.author_id for follow in pages], recipes_limit):
+            author_recipes[recipe.author_id].append(recipe)
         serializer = SubscriptionSerializer(
             pages,
             many=True,
-            context={'request': request})
+            context={'request': request,
+                     'author_recipes': author_recipes})
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -57,54 +119,153 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscribe(self, request, **kwargs):
-        if self.request.method == 'POST':
-            user = get_object_or_404(User, pk=kwargs.get('id'))
-            context = {'request': self.request, 'user': user}
-            serializer = SubscriptionSerializer(data=request.data,
-                                                context=context)
-            if serializer.is_valid(raise_exception=True):
-                serializer.save(user=request.user, author=user)
-                return Response(data=serializer.data,
-                                status=status.HTTP_201_CREATED)
-        if self.request.method == 'DELETE':
-            user = request.user
-            author = get_object_or_404(User, pk=kwargs.get('id'))
-            if not Follow.objects.filter(user=user, author=author).exists():
+        author_id = get_object_id(kwargs.get('id'))
+        if request.method == 'POST':
+            author = get_object_or_404(User, pk=author_id)
+            if author == request.user:
                 return Response(
-                    {'error': 'Вы не были подписаны на данного пользователя'},
+                    {'error': 'Нельзя подписываться на самого себя'},
                     status=status.HTTP_400_BAD_REQUEST)
-            follow = get_object_or_404(Follow, user=user, author=author)
-            follow.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+            follow = subscriptions.add_one(request.user, author.pk)
+            if follow is None:
+                return Response(
+                    {'error': 'Вы уже подписаны на данного автора'},
+                    status=status.HTTP_400_BAD_REQUEST)
+            serializer = SubscriptionSerializer(
+                follow, context={'request': request})
+            return Response(data=serializer.data,
+                            status=status.HTTP_201_CREATED)
+        results = subscriptions.remove(request.user, [author_id])
+        if results[0]['status'] != DELETED:
+            get_object_or_404(User, pk=author_id)
+            return Response(
+                {'error': 'Вы не были подписаны на данного пользователя'},
+                status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=False,
+        methods=(['POST', 'DELETE']),
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe',
+        url_name='subscribe-bulk'
+    )
+    def subscribe_bulk(self, request):
+        return change_relations(request, subscriptions)
 
 
-class TagListRetrieveViewSet(ListRetrieveModelMixin):
+class TagListRetrieveViewSet(CachedCatalogMixin, ListRetrieveModelMixin):
+    catalog = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    query_budgets = {'list': QueryBudget(2), 'retrieve': QueryBudget(2)}
 
 
-class IngredientListRetrieveViewSet(ListRetrieveModelMixin):
+class IngredientListRetrieveViewSet(CachedCatalogMixin,
+                                    ListRetrieveModelMixin):
+    catalog = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filterset_class = IngredientFilter
     filter_backends = (DjangoFilterBackend,)
+    query_budgets = {'list': QueryBudget(2), 'retrieve': QueryBudget(2)}
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly]
+    pagination_class = FeedPagination
     filterset_class = RecipeFilter
     filter_backends = (DjangoFilterBackend,)
+    response_cache_params = (
+        'tags', 'author', 'cursor', 'limit', 'ordering', 'search',
+        'is_favorited', 'is_in_shopping_cart', 'image_size')
+    response_cache_bypass_params = ('format', 'approximate_count')
+    query_budgets = {
+        'list': QueryBudget(5),
+        'retrieve': QueryBudget(4),
+        'feed': QueryBudget(4),
+        'similar': QueryBudget(2),
+        'what_can_i_cook': QueryBudget(4, params=get_pantry_params),
+        'download_shopping_cart': QueryBudget(3),
+    }
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Recipe.objects.add_user_annotations(self.request.user.id)
-        return Recipe.objects.add_user_annotations(
-            Value(None, output_field=BooleanField()))
+            user_id = self.request.user.id
+        else:
+            user_id = Value(None, output_field=BooleanField())
+        queryset = Recipe.objects.add_user_annotations(
+            user_id).defer('search_vector')
+        if self.use_fragments() or self.action in ('list', 'retrieve'):
+            return queryset.select_related('author')
+        return queryset.with_read_relations()
+
+    def paginate_queryset(self, queryset):
+        recipes = super().paginate_queryset(queryset)
+        if self.action == 'list' and not self.use_fragments():
+            prefetch_concurrently(recipes, *get_read_prefetches())
+        return recipes
+
+    def get_object(self):
+        recipe = super().get_object()
+        if self.action == 'retrieve':
+            prefetch_concurrently([recipe], *get_read_prefetches())
+        return recipe
+
+    def use_fragments(self):
+        return (
+            self.action in ('list', 'feed')
+            and self.request.user.is_authenticated
+            and self.request.accepted_renderer.format == 'json'
+        )
+
+    def get_fragments_response(self, recipes):
+        fragments = render_recipes(
+            recipes, RecipeReadSerializer, self.get_serializer_context(),
+            get_read_prefetches())
+        page = self.get_paginated_response([])
+        response = HttpResponse(render_page(page, fragments),
+                                content_type='application/json')
+        for header, value in page.items():
+            response.setdefault(header, value)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fragments():
+            return super().list(request, *args, **kwargs)
+        return self.get_fragments_response(self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())))
+
+    @property
+    def cursor_ordering(self):
+        return SCORE_ORDERINGS.get(
+            self.request.query_params.get('ordering'), ('-pub_date', '-id'))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        image_size = self.request.query_params.get('image_size')
+        if image_size in settings.IMAGE_RENDITIONS:
+            context['image_size'] = image_size
+        elif image_size != 'original' and self.action in (
+                'list', 'feed', 'what_can_i_cook'):
+            context['image_size'] = settings.RECIPE_LIST_IMAGE_SIZE
+        return context
+
+    def get_response_tags(self, data):
+        if self.action == 'retrieve':
+            recipes = [data]
+            tags = {f'recipe:{data["id"]}'}
+        else:
+            recipes = data['results']
+            tags = {'recipes'}
+            if self.request.query_params.get('ordering') in SCORE_ORDERINGS:
+                tags.add('scores')
+        return tags | {'tags', 'ingredients'} | {
+            f'user:{recipe["author"]["id"]}' for recipe in recipes}
 
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
@@ -114,48 +275,126 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        methods=(['GET']),
+        permission_classes=[IsAuthenticated],
+        pagination_class=SubscriptionFeedPagination
+    )
+    def feed(self, request):
+        recipes = self.paginate_queryset(self.get_queryset())
+        if self.use_fragments():
+            return self.get_fragments_response(recipes)
+        serializer = self.get_serializer(recipes, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=(['GET']))
+    def similar(self, request, pk=None):
+        limit = min(
+            get_positive_int(request.query_params, 'limit')
+            or settings.SIMILAR_RECIPES_LIMIT,
+            settings.SIMILAR_RECIPES_NEIGHBORS)
+        recipe_id = get_object_id(pk)
+        neighbors = [other_id for other_id, _ in similar_index.get(
+            recipe_id, limit)]
+        recipes = Recipe.objects.in_bulk(neighbors)
+        if not recipes and not Recipe.objects.filter(pk=recipe_id).exists():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        serializer = SubscriptionRecipeSerializerRead(
+            [recipes[recipe_id] for recipe_id in neighbors
+             if recipe_id in recipes], many=True,
+            context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=False, methods=(['GET']))
+    def what_can_i_cook(self, request):
+        try:
+            ingredient_ids = [
+                int(pk) for value in request.query_params.getlist(
+                    'ingredients') for pk in value.split(',') if pk]
+        except ValueError:
+            return Response(
+                {'error': 'Ингредиенты задаются числовыми id'},
+                status=status.HTTP_400_BAD_REQUEST)
+        if not ingredient_ids:
+            return Response(
+                {'error': 'Не указаны ингредиенты'},
+                status=status.HTTP_400_BAD_REQUEST)
+        limit = min(
+            get_positive_int(request.query_params, 'limit')
+            or settings.PANTRY_SEARCH_LIMIT, settings.PANTRY_SEARCH_MAX_LIMIT)
+        matches = pantry_index.search(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk([pk for pk, _ in matches])
+        results = []
+        for pk, missing in matches:
+            if pk in recipes:
+                recipes[pk].missing_ingredients_count = missing
+                results.append(recipes[pk])
+        serializer = CookableRecipeSerializer(
+            results, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
     @action(
         detail=False,
         methods=(['GET']),
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        product_list = get_product_list(request.user)
-        response = HttpResponse(product_list,
-                                content_type='text/plain')
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': 'Неподдерживаемый формат файла'},
+                status=status.HTTP_400_BAD_REQUEST)
+        renderer, content_type = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            renderer(iter_products(request.user)),
+            content_type=content_type)
+        filename = f'{Path(settings.SHOPPING_CART).stem}.{file_format}'
         response['Content-Disposition'] = (
-            f'attachment; filename={settings.SHOPPING_CART}')
+            f'attachment; filename={filename}')
         return response
 
+    def change_recipe_relation(self, request, relation, serializer_class,
+                               messages):
+        recipe_id = get_object_id(self.kwargs.get('pk'))
+        if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, pk=recipe_id)
+            instance = relation.add_one(request.user, recipe.pk)
+            if instance is None:
+                return Response({'error': messages[EXISTS]},
+                                status=status.HTTP_400_BAD_REQUEST)
+            serializer = serializer_class(instance,
+                                          context={'request': request})
+            return Response(data=serializer.data,
+                            status=status.HTTP_201_CREATED)
+        results = relation.remove(request.user, [recipe_id])
+        if results[0]['status'] != DELETED:
+            get_object_or_404(Recipe, pk=recipe_id)
+            return Response({'error': messages[ABSENT]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
         detail=True,
         methods=(['POST', 'DELETE']),
         permission_classes=[IsAuthenticated]
     )
     def shopping_cart(self, request, **kwargs):
-        if request.method == 'POST':
-            recipe = get_object_or_404(Recipe, pk=kwargs.get('pk'))
-            context = {'request': request, 'recipe': recipe}
-            serializer = ShoppingCardSerializer(data=request.data,
-                                                context=context)
-            if serializer.is_valid(raise_exception=True):
-                serializer.save(user=request.user, recipe=recipe)
-                return Response(data=serializer.data,
-                                status=status.HTTP_201_CREATED)
-
-        if request.method == 'DELETE':
-            recipe = get_object_or_404(Recipe, pk=kwargs.get('pk'))
-            user = request.user
-            if not ShoppingCard.objects.filter(user=user,
-                                               recipe=recipe).exists():
-                return Response(
-                    {'error': 'У вас не было этого рецепта в списке покупок'},
-                    status=status.HTTP_400_BAD_REQUEST)
-            shopping_card = get_object_or_404(ShoppingCard, user=user,
-                                              recipe=recipe)
-            shopping_card.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.change_recipe_relation(
+            request, shopping_cart, ShoppingCardSerializer, {
+                EXISTS: 'рецепт уже в списке покупок',
+                ABSENT: 'У вас не было этого рецепта в списке покупок',
+            })
+
+    @action(
+        detail=False,
+        methods=(['POST', 'DELETE']),
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk'
+    )
+    def shopping_cart_bulk(self, request):
+        return change_relations(request, shopping_cart)
 
     @action(
         detail=True,
@@ -163,23 +402,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def favorite(self, request, **kwargs):
-        if request.method == 'POST':
-            recipe = get_object_or_404(Recipe, pk=kwargs.get('pk'))
-            context = {'request': request, 'recipe': recipe}
-            serializer = FavoriteSerializer(data=request.data, context=context)
-            if serializer.is_valid(raise_exception=True):
-                serializer.save(user=request.user, recipe=recipe)
-                return Response(data=serializer.data,
-                                status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE':
-            recipe = get_object_or_404(Recipe, pk=kwargs.get('pk'))
-            user = request.user
-            if not Favorite.objects.filter(user=user, recipe=recipe).exists():
-                return Response(
-                    {'error': 'У вас не было этого рецепта в избранном'},
-                    status=status.HTTP_400_BAD_REQUEST)
-            favorite_recipe = get_object_or_404(Favorite, user=user,
-                                                recipe=recipe)
-            favorite_recipe.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.change_recipe_relation(
+            request, favorites, FavoriteSerializer, {
+                EXISTS: 'рецепт уже в избранном',
+                ABSENT: 'У вас не было этого рецепта в избранном',
+            })
+
+    @action(
+        detail=False,
+        methods=(['POST', 'DELETE']),
+        permission_classes=[IsAuthenticated],
+        url_path='favorite',
+        url_name='favorite-bulk'
+    )
+    def favorite_bulk(self, request):
+        return change_relations(request, favorites)
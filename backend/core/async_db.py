@@ -0,0 +1,80 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import prefetch_related_objects
+
+concurrent_queries = contextvars.ContextVar('concurrent_queries',
+                                            default=False)
+view_executor = ThreadPoolExecutor(
+    settings.ASYNC_VIEW_THREADS, thread_name_prefix='foodgram-view')
+query_executor = ThreadPoolExecutor(
+    settings.ASYNC_QUERY_THREADS, thread_name_prefix='foodgram-query')
+
+
+def run_with_connections(func, *args, **kwargs):
+    """Вызов в рабочем потоке с обслуживанием его соединений.
+
+    У каждого потока свои соединения с БД: как и в начале и в конце
+    запроса Django, закрываются только устаревшие по ``CONN_MAX_AGE`` и
+    оборванные, остальные переиспользуются следующими вызовами. Воркер
+    держит не больше ``ASYNC_VIEW_THREADS + ASYNC_QUERY_THREADS``
+    соединений.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def database_sync_to_async(func):
+    """Синхронный код с ORM как корутина в пуле ``view_executor``."""
+    return sync_to_async(
+        wraps(func)(partial(run_with_connections, func)),
+        thread_sensitive=False, executor=view_executor)
+
+
+def can_run_concurrently():
+    """Параллельные запросы включены async-представлениями.
+
+    Внутри транзакции запросы идут по очереди: другие потоки не видят
+    её незафиксированных данных.
+    """
+    return concurrent_queries.get() and not any(
+        connection.in_atomic_block for connection in connections.all())
+
+
+def run_concurrently(*funcs):
+    """Выполняет независимые функции с запросами и возвращает результаты."""
+    if len(funcs) < 2 or not can_run_concurrently():
+        return [func() for func in funcs]
+    futures = [
+        query_executor.submit(
+            contextvars.copy_context().run, run_with_connections, func)
+        for func in funcs
+    ]
+    return [future.result() for future in futures]
+
+
+def prefetch_concurrently(instances, *lookups):
+    """prefetch_related_objects, где независимые связи грузятся параллельно.
+
+    Вложенные lookups с общим первым звеном остаются в одной группе
+    и выполняются по порядку.
+    """
+    groups = {}
+    for lookup in lookups:
+        path = getattr(lookup, 'prefetch_through', lookup)
+        groups.setdefault(path.split('__')[0], []).append(lookup)
+    if len(groups) < 2 or not instances or not can_run_concurrently():
+        prefetch_related_objects(instances, *lookups)
+        return
+    for instance in instances:
+        instance.__dict__.setdefault('_prefetched_objects_cache', {})
+    run_concurrently(*(
+        partial(prefetch_related_objects, instances, *group)
+        for group in groups.values()))
@@ -0,0 +1,34 @@
+import hashlib
+
+from core.replicas import use_primary
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def get_token_cache_key(key):
+    return f'auth_token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def invalidate_tokens(*keys):
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кэшем пользователя по токену.
+
+    Запись живёт TOKEN_CACHE_TIMEOUT секунд и сбрасывается сигналами
+    после коммита удаления токена (logout, смена пароля) и сохранения
+    пользователя (деактивация, правка профиля): сброс до коммита дал бы
+    параллельному запросу вернуть в кэш старые данные. Токен читается из
+    основной БД: сразу после логина реплика может его ещё не получить.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            with use_primary():
+                credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.TOKEN_CACHE_TIMEOUT)
+        return credentials
@@ -0,0 +1,79 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from core.catalog_cache import get_catalog_version
+from core.replicas import use_primary
+from recipes.models import Ingredient
+
+
+def normalize(value):
+    return value.strip().casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Отсортированный массив названий ингредиентов в памяти воркера.
+
+    Сначала ищутся совпадения по префиксу (бинарный поиск), затем по
+    подстроке. Индекс перестраивается, когда меняется версия
+    справочника ингредиентов в общем кэше.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.state = ([], [], '', [])
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = get_catalog_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock, use_primary():
+            if version == self.version:
+                return
+            rows = sorted(
+                (normalize(name), pk)
+                for pk, name in Ingredient.objects.values_list('pk', 'name')
+            )
+            keys = [key for key, _ in rows]
+            ids = [pk for _, pk in rows]
+            offsets = []
+            offset = 0
+            for key in keys:
+                offsets.append(offset)
+                offset += len(key) + 1
+            self.state = (keys, ids, '\n'.join(keys), offsets)
+            self.version = version
+
+    @staticmethod
+    def find_substrings(query, corpus, offsets):
+        matches = {}
+        position = corpus.find(query)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            shift = position - offsets[index]
+            if shift > 0 and index not in matches:
+                matches[index] = shift
+            position = corpus.find(query, position + 1)
+        return matches
+
+    def search(self, query, limit):
+        self.refresh()
+        query = normalize(query)
+        keys, ids, corpus, offsets = self.state
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        prefix = sorted(range(start, end),
+                        key=lambda index: (len(keys[index]), keys[index]))
+        if len(prefix) >= limit:
+            return [ids[index] for index in prefix[:limit]]
+        substring = sorted(
+            self.find_substrings(query, corpus, offsets).items(),
+            key=lambda item: (item[1], len(keys[item[0]]), keys[item[0]]))
+        matches = prefix + [index for index, _ in substring
+                            if not start <= index < end]
+        return [ids[index] for index in matches[:limit]]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from core.replicas import is_settled
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_cache = LRUCache(settings.CATALOG_CACHE_LRU_SIZE)
+
+
+def get_shared_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_version_key(catalog):
+    return f'catalog:{catalog}:version'
+
+
+def get_catalog_version(catalog):
+    return get_shared_cache().get_or_set(
+        get_version_key(catalog), time.time_ns(), None)
+
+
+def invalidate_catalog(catalog):
+    get_shared_cache().set(get_version_key(catalog), time.time_ns(), None)
+
+
+def get_entry(key):
+    entry = local_cache.get(key)
+    if entry is None:
+        entry = get_shared_cache().get(key)
+        if entry is not None:
+            local_cache.set(key, entry)
+    return entry
+
+
+def set_entry(key, entry):
+    get_shared_cache().set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+    local_cache.set(key, entry)
+
+
+class CachedCatalogMixin:
+    """Отдаёт справочник готовыми JSON-байтами с поддержкой ETag.
+
+    Ответы хранятся в LRU воркера и в общем кэше Django под ключом
+    с версией справочника ``catalog``; версию меняют сигналы моделей.
+    """
+
+    catalog = None
+
+    def get_catalog_key(self, request, version, **kwargs):
+        query = sorted(request.query_params.lists())
+        variant = hashlib.md5(
+            f'{self.action}:{kwargs}:{query}'.encode()).hexdigest()
+        return f'catalog:{self.catalog}:{version}:{variant}'
+
+    def get_cached_response(self, request, render, **kwargs):
+        version = get_catalog_version(self.catalog)
+        key = self.get_catalog_key(request, version, **kwargs)
+        entry = get_entry(key)
+        if entry is None:
+            response = render()
+            content = JSONRenderer().render(response.data)
+            entry = (content, f'"{hashlib.md5(content).hexdigest()}"')
+            if is_settled(version):
+                set_entry(key, entry)
+        content, etag = entry
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(CachedCatalogMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(CachedCatalogMixin, self).retrieve(
+                request, *args, **kwargs), **kwargs)
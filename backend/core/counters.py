@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from recipes.models import Favorite, Follow, Recipe, ShoppingCard
+
+User = get_user_model()
+
+RECIPE_COUNTERS = {
+    'favorites_count': (Favorite, 'recipe'),
+    'in_carts_count': (ShoppingCard, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (Follow, 'author'),
+}
+
+
+def change_counter(model, pk, field, delta):
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def get_count_subquery(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    counts = counts.values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount(queryset, counters):
+    """Пересчитывает счётчики одним UPDATE, возвращает число строк."""
+    return queryset.update(**{
+        name: get_count_subquery(model, field)
+        for name, (model, field) in counters.items()
+    })
+
+
+def recount_all():
+    return (recount(Recipe.objects.all(), RECIPE_COUNTERS),
+            recount(User.objects.all(), USER_COUNTERS))
@@ -0,0 +1,93 @@
+import hashlib
+
+from core.async_db import prefetch_concurrently
+from core.replicas import is_settled
+from core.response_cache import get_cache, get_tag_versions
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+USER_FLAGS = (
+    ('is_favorited', b'"is_favorited":false', b'"is_favorited":true'),
+    ('is_in_shopping_cart', b'"is_in_shopping_cart":false',
+     b'"is_in_shopping_cart":true'),
+    ('author_is_subscribed', b'"is_subscribed":false',
+     b'"is_subscribed":true'),
+)
+RESULTS_PLACEHOLDER = b'"results":[]'
+
+
+def get_fragment_tags(recipe):
+    return (f'recipe:{recipe.pk}', f'user:{recipe.author_id}', 'tags',
+            'ingredients')
+
+
+def get_fragment_prefix(context):
+    variant = hashlib.md5(
+        f'{context["request"].build_absolute_uri("/")}:'
+        f'{context.get("image_size")}'.encode()).hexdigest()
+    return f'recipe_fragment:{variant}'
+
+
+def render_fragment(recipe, serializer_class, context):
+    """JSON рецепта со сброшенными флагами пользователя."""
+    flags = {name: getattr(recipe, name, False) for name, _, _ in USER_FLAGS}
+    for name in flags:
+        setattr(recipe, name, False)
+    try:
+        return JSONRenderer().render(
+            serializer_class(recipe, context=context).data)
+    finally:
+        for name, value in flags.items():
+            setattr(recipe, name, value)
+
+
+def merge_user_flags(fragment, recipe):
+    for name, unset, value in USER_FLAGS:
+        if getattr(recipe, name, False):
+            fragment = fragment.replace(unset, value, 1)
+    return fragment
+
+
+def render_recipes(recipes, serializer_class, context, prefetches):
+    """JSON-фрагменты страницы рецептов.
+
+    Часть рецепта, не зависящая от пользователя, берётся из кэша под
+    версиями тегов кэша ответов (рецепт, автор, теги, ингредиенты).
+    Промахи догружают связи ``prefetches`` и сериализуются, флаги
+    пользователя берутся из аннотаций рецептов и подставляются в готовый
+    JSON.
+    """
+    prefix = get_fragment_prefix(context)
+    versions = get_tag_versions(
+        {tag for recipe in recipes for tag in get_fragment_tags(recipe)})
+    keys = {f'{prefix}:{recipe.pk}': recipe for recipe in recipes}
+    cached = get_cache().get_many(keys)
+    fragments = {}
+    missing = {}
+    for key, recipe in keys.items():
+        stamp = tuple(versions[tag] for tag in get_fragment_tags(recipe))
+        entry = cached.get(key)
+        if entry is not None and entry[0] == stamp:
+            fragments[recipe.pk] = entry[1]
+        else:
+            missing[key] = (recipe, stamp)
+    if missing:
+        prefetch_concurrently(
+            [recipe for recipe, _ in missing.values()], *prefetches)
+        rendered = {}
+        for key, (recipe, stamp) in missing.items():
+            fragments[recipe.pk] = render_fragment(
+                recipe, serializer_class, context)
+            if all(map(is_settled, stamp)):
+                rendered[key] = (stamp, fragments[recipe.pk])
+        get_cache().set_many(rendered, settings.RECIPE_FRAGMENT_TIMEOUT)
+    return [merge_user_flags(fragments[recipe.pk], recipe)
+            for recipe in recipes]
+
+
+def render_page(response, fragments):
+    """Подставляет фрагменты в ответ пагинатора с пустым results."""
+    content = JSONRenderer().render(response.data)
+    return content.replace(
+        RESULTS_PLACEHOLDER,
+        b'"results":[' + b','.join(fragments) + b']', 1)
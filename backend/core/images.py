@@ -0,0 +1,98 @@
+import base64
+import binascii
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import PurePosixPath
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def decode_base64_image(data):
+    """Декодирует data:image;base64 по частям во временный файл."""
+    header, encoded = data.split(';base64,', 1)
+    ext = header.split('/')[-1]
+    limit = settings.IMAGE_UPLOAD_MAX_SIZE
+    if len(encoded) // 4 * 3 > limit:
+        raise serializers.ValidationError(
+            f'Размер изображения не должен превышать {limit} байт.')
+    image = TemporaryUploadedFile(
+        f'{uuid4().hex}.{ext}', f'image/{ext}', 0, None)
+    size = 0
+    try:
+        for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                encoded[start:start + DECODE_CHUNK_SIZE], validate=True)
+            size += len(chunk)
+            image.write(chunk)
+    except (binascii.Error, ValueError):
+        image.close()
+        raise serializers.ValidationError('Некорректная строка base64.')
+    image.size = size
+    image.seek(0)
+    return image
+
+
+def get_rendition_name(name, size):
+    """Имя превью по полному имени оригинала вместе с расширением."""
+    path = PurePosixPath(name)
+    return str(path.parent / 'renditions' / f'{path.name}.{size}.webp')
+
+
+def get_rendition_url(name, size):
+    rendition = get_rendition_name(name, size)
+    if default_storage.exists(rendition):
+        return default_storage.url(rendition)
+    return None
+
+
+def generate_renditions(name):
+    for size, dimensions in settings.IMAGE_RENDITIONS.items():
+        rendition = get_rendition_name(name, size)
+        if default_storage.exists(rendition):
+            continue
+        with default_storage.open(name) as source:
+            image = Image.open(source)
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        if dimensions is not None:
+            image.thumbnail(dimensions)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_RENDITIONS_QUALITY)
+        default_storage.save(rendition, ContentFile(buffer.getvalue()))
+
+
+def run_generate_renditions(name, on_done=None):
+    try:
+        generate_renditions(name)
+    except Exception:
+        logger.exception('Не удалось подготовить превью для %s', name)
+        return
+    if on_done is not None:
+        on_done()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_RENDITIONS_WORKERS,
+        thread_name_prefix='image-renditions')
+
+
+def schedule_renditions(name, on_done=None):
+    if settings.IMAGE_RENDITIONS_SYNC:
+        run_generate_renditions(name, on_done)
+        return
+    get_executor().submit(run_generate_renditions, name, on_done)
@@ -0,0 +1,194 @@
+import base64
+import io
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from recipes.models import Follow, Ingredient, Recipe, ShoppingCard, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+CART_SIZE = 10
+RECIPE_INGREDIENTS = 10
+
+
+def get_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), (120, 200, 90)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+def get_percentile(timings, percent):
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[
+        percent - 1]
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), capture_output=True,
+            text=True, cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеряет основные эндпоинты API через тестовый клиент и '
+            'печатает p50/p95/p99, число запросов к БД и пропускную '
+            'способность в JSON. Изменения в БД откатываются, файлы '
+            'пишутся во временный MEDIA_ROOT.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Количество замеряемых запросов на сценарий.')
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Количество прогревочных запросов на сценарий.')
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Запустить только указанные сценарии.')
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта вместо stdout.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests должен быть больше 0.')
+        database = router.db_for_write(Recipe)
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                DATABASE_REPLICAS=[]), transaction.atomic(using=database):
+            user = self.get_user()
+            self.client = APIClient()
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f'Token {self.get_token(user)}')
+            self.anonymous = APIClient()
+            self.prepare(user)
+            scenarios = self.get_scenarios()
+            unknown = set(options['scenarios'] or ()) - set(scenarios)
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}.')
+            results = {}
+            for name, run in scenarios.items():
+                if options['scenarios'] and name not in options['scenarios']:
+                    continue
+                results[name] = self.measure(
+                    run, connections[database], options)
+            transaction.set_rollback(True, using=database)
+        report = json.dumps({
+            'revision': get_revision(),
+            'database': connections[database].vendor,
+            'recipes': Recipe.objects.count(),
+            'users': User.objects.count(),
+            'requests': options['requests'],
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def get_user(self):
+        """Пользователь с наибольшим числом подписок."""
+        follower = Follow.objects.values('user_id').annotate(
+            follows=Count('id')).order_by('-follows').first()
+        if follower is None:
+            raise CommandError('В базе нет подписок, выполните seed_foodgram.')
+        return User.objects.get(pk=follower['user_id'])
+
+    def get_token(self, user):
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def prepare(self, user):
+        recipe_ids = list(Recipe.objects.order_by('-pub_date').values_list(
+            'pk', flat=True)[:CART_SIZE])
+        ShoppingCard.objects.bulk_create(
+            [ShoppingCard(user=user, recipe_id=pk) for pk in recipe_ids],
+            ignore_conflicts=True)
+        self.tag_ids = list(Tag.objects.values_list('pk', flat=True)[:2])
+        if not self.tag_ids:
+            raise CommandError('В базе нет тегов, выполните seed_foodgram.')
+        self.ingredient_ids = list(Ingredient.objects.values_list(
+            'pk', flat=True)[:RECIPE_INGREDIENTS])
+        self.ingredient_query = Ingredient.objects.values_list(
+            'name', flat=True).first()[:3]
+        self.image = get_image()
+        self.recipe_id = self.create_recipe().data['id']
+
+    def get_recipe_payload(self, amount=1):
+        return {
+            'name': f'Замер {uuid.uuid4().hex[:12]}',
+            'text': 'Рецепт для замера.',
+            'cooking_time': 10,
+            'image': self.image,
+            'tags': self.tag_ids,
+            'ingredients': [{'id': pk, 'amount': amount + index}
+                            for index, pk in enumerate(self.ingredient_ids)],
+        }
+
+    def create_recipe(self):
+        response = self.client.post(
+            '/api/recipes/', self.get_recipe_payload(), format='json')
+        if response.status_code != 201:
+            raise CommandError(f'Не удалось создать рецепт: {response.data}')
+        return response
+
+    def get_scenarios(self):
+        client = self.client
+        return {
+            'recipes_list_anonymous': lambda: self.anonymous.get(
+                '/api/recipes/'),
+            'recipes_list': lambda: client.get('/api/recipes/'),
+            'recipes_detail': lambda: client.get(
+                f'/api/recipes/{self.recipe_id}/'),
+            'subscriptions': lambda: client.get(
+                '/api/users/subscriptions/?recipes_limit=3'),
+            'ingredients_search': lambda: client.get(
+                '/api/ingredients/', {'name': self.ingredient_query}),
+            'download_shopping_cart': lambda: b''.join(client.get(
+                '/api/recipes/download_shopping_cart/').streaming_content),
+            'recipe_create': self.create_recipe,
+            'recipe_patch': lambda: client.patch(
+                f'/api/recipes/{self.recipe_id}/', self.get_recipe_payload(
+                    int(time.monotonic() * 1000) % 100 + 1), format='json'),
+        }
+
+    def measure(self, run, connection, options):
+        for _ in range(options['warmup']):
+            run()
+        timings = []
+        queries = []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                run()
+                timings.append(
+                    (time.perf_counter() - request_started) * 1000)
+            queries.append(len(captured))
+        elapsed = time.perf_counter() - started
+        return {
+            'p50_ms': round(get_percentile(timings, 50), 3),
+            'p95_ms': round(get_percentile(timings, 95), 3),
+            'p99_ms': round(get_percentile(timings, 99), 3),
+            'queries_per_request': round(statistics.mean(queries), 2),
+            'max_queries': max(queries),
+            'throughput_rps': round(options['requests'] / elapsed, 1),
+        }
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import statistics
+import time
+from contextlib import contextmanager
+
+from core.management.commands.benchmark_api import get_percentile, get_revision
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from recipes.models import Follow, Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-async',
+    },
+}
+
+
+@contextmanager
+def slow_database(delay):
+    """Добавляет задержку к каждому SQL-запросу во всех потоках."""
+    def slow_query(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def install(sender=None, connection=None, **kwargs):
+        if slow_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow_query)
+
+    for connection in connections.all():
+        install(connection=connection)
+    connection_created.connect(install, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for connection in connections.all():
+            if slow_query in connection.execute_wrappers:
+                connection.execute_wrappers.remove(slow_query)
+
+
+def read_content(response):
+    if response.status_code != 200:
+        raise CommandError(
+            f'Ответ {response.status_code}: {response.content[:200]}')
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает синхронный путь (один sync-воркер обрабатывает '
+            'запросы по очереди) с ASGI-путём (один event loop обслуживает '
+            'их одновременно) при искусственно медленной БД и печатает '
+            'задержки и пропускную способность в JSON. Данные в БД не '
+            'меняются, кэш — локальный на время замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Количество одновременных запросов в пачке.')
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Количество пачек на сценарий.')
+        parser.add_argument(
+            '--delay', type=float, default=10,
+            help='Задержка каждого SQL-запроса в миллисекундах.')
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Запустить только указанные сценарии.')
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта вместо stdout.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['rounds'] < 1:
+            raise CommandError(
+                '--concurrency и --rounds должны быть больше 0.')
+        if options['delay'] < 0:
+            raise CommandError('--delay не может быть отрицательным.')
+        self.authorization = f'Token {self.get_token()}'
+        scenarios = self.get_scenarios()
+        unknown = set(options['scenarios'] or ()) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}.')
+        results = {}
+        with override_settings(CACHES=LOCAL_CACHES), slow_database(
+                options['delay'] / 1000):
+            for name, url in scenarios.items():
+                if options['scenarios'] and name not in options['scenarios']:
+                    continue
+                sync = self.run_sync(url, options)
+                asynchronous = asyncio.run(self.run_async(url, options))
+                results[name] = {
+                    'sync': sync,
+                    'async': asynchronous,
+                    'speedup': round(asynchronous['throughput_rps']
+                                     / sync['throughput_rps'], 2),
+                }
+        report = json.dumps({
+            'revision': get_revision(),
+            'database': connections['default'].vendor,
+            'delay_ms': options['delay'],
+            'concurrency': options['concurrency'],
+            'rounds': options['rounds'],
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def get_token(self):
+        """Токен пользователя с наибольшим числом подписок."""
+        follower = Follow.objects.values('user_id').annotate(
+            follows=Count('id')).order_by('-follows').first()
+        if follower is None:
+            raise CommandError('В базе нет подписок, выполните seed_foodgram.')
+        return Token.objects.get_or_create(user_id=follower['user_id'])[0].key
+
+    def get_scenarios(self):
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        if recipe is None or ingredient is None:
+            raise CommandError('В базе нет рецептов, выполните seed_foodgram.')
+        return {
+            'recipes_list': '/api/recipes/?limit=12',
+            'recipes_detail': f'/api/recipes/{recipe.pk}/',
+            'tags': '/api/tags/',
+            'ingredients': f'/api/ingredients/?name={ingredient[:3]}',
+            'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+        }
+
+    def summarize(self, latencies, elapsed, options):
+        latencies = sorted(latency * 1000 for latency in latencies)
+        return {
+            'p50_ms': round(get_percentile(latencies, 50), 3),
+            'p95_ms': round(get_percentile(latencies, 95), 3),
+            'mean_ms': round(statistics.mean(latencies), 3),
+            'throughput_rps': round(
+                options['concurrency'] * options['rounds'] / elapsed, 1),
+        }
+
+    def run_sync(self, url, options):
+        """Пачка запросов в очереди одного синхронного воркера."""
+        client = Client(HTTP_AUTHORIZATION=self.authorization)
+        latencies = []
+        elapsed = 0
+        with override_settings(ROOT_URLCONF='foodgram.urls'):
+            read_content(client.get(url))
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                for _ in range(options['concurrency']):
+                    read_content(client.get(url))
+                    latencies.append(time.perf_counter() - started)
+                elapsed += time.perf_counter() - started
+        return self.summarize(latencies, elapsed, options)
+
+    async def run_async(self, url, options):
+        """Пачка одновременных запросов к ASGI-приложению."""
+        client = AsyncClient()
+
+        async def request(started):
+            read_content(await client.get(
+                url, authorization=self.authorization))
+            return time.perf_counter() - started
+
+        latencies = []
+        elapsed = 0
+        with override_settings(ROOT_URLCONF='foodgram.asgi_urls'):
+            await request(time.perf_counter())
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                latencies.extend(await asyncio.gather(*(
+                    request(started)
+                    for _ in range(options['concurrency']))))
+                elapsed += time.perf_counter() - started
+        return self.summarize(latencies, elapsed, options)
@@ -0,0 +1,92 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Follow, Recipe
+
+User = get_user_model()
+
+FOLLOW_COUNTS = (1, 100, 1000)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет ленту подписок при 1, 100 и 1000 подписках. '
+            'Тестовые данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes-per-author', type=int, default=20,
+            help='Количество рецептов у каждого автора.')
+        parser.add_argument(
+            '--page-size', type=int, default=8,
+            help='Размер страницы ленты.')
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='Сколько страниц пройти по курсору.')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество повторов каждого замера.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for follows in FOLLOW_COUNTS:
+                reader = self.create_data(
+                    follows, options['recipes_per_author'])
+                self.report(follows, 'feed', options, lambda position: (
+                    Recipe.objects.feed(
+                        reader.id, options['page_size'] + 1, position)))
+                self.report(follows, 'filter', options, lambda position: (
+                    self.naive_page(
+                        reader.id, options['page_size'] + 1, position)))
+            transaction.set_rollback(True)
+
+    def create_data(self, follows, recipes_per_author):
+        prefix = uuid.uuid4().hex[:8]
+        reader = User.objects.create(
+            username=f'{prefix}-reader', email=f'{prefix}-reader@bench')
+        authors = User.objects.bulk_create([
+            User(username=f'{prefix}-{index}',
+                 email=f'{prefix}-{index}@bench')
+            for index in range(follows)
+        ])
+        if not all(author.pk for author in authors):
+            authors = list(User.objects.filter(
+                username__startswith=f'{prefix}-').exclude(pk=reader.pk))
+        Recipe.objects.bulk_create([
+            Recipe(author=author, name=f'{prefix}-{index}', text='-',
+                   cooking_time=1, image='recipes/benchmark.png')
+            for author in authors for index in range(recipes_per_author)
+        ], batch_size=1000)
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author=author) for author in authors])
+        return reader
+
+    @staticmethod
+    def naive_page(user_id, limit, position):
+        recipes = Recipe.objects.filter(
+            author__following__user_id=user_id).order_by('-pub_date', '-id')
+        if position is not None:
+            pub_date, pk = position
+            recipes = recipes.filter(pub_date__lte=pub_date).exclude(
+                pub_date=pub_date, id__gte=pk)
+        return list(recipes[:limit])
+
+    def report(self, follows, name, options, fetch_page):
+        timings = []
+        for _ in range(options['repeat']):
+            position = None
+            started = time.perf_counter()
+            for _ in range(options['pages']):
+                page = fetch_page(position)[:options['page_size']]
+                if not page:
+                    break
+                position = (page[-1].pub_date, page[-1].pk)
+            timings.append(
+                (time.perf_counter() - started) * 1000 / options['pages'])
+        self.stdout.write(
+            f'{name:<7} подписок={follows:<5} '
+            f'p50={statistics.median(timings):.2f} мс '
+            f'max={max(timings):.2f} мс')
@@ -0,0 +1,32 @@
+import time
+
+from core.similar import SimilarRecipesBuilder
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Собирает индекс похожих рецептов по ингредиентам и тегам. '
+            'С --update пересчитывает только изменённые рецепты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновить существующий индекс вместо полной сборки.')
+        parser.add_argument(
+            '--directory',
+            help='Каталог индекса; по умолчанию SIMILAR_RECIPES_DIR.')
+
+    def handle(self, *args, **options):
+        builder = SimilarRecipesBuilder(options['directory'])
+        started = time.monotonic()
+        processed = None
+        if options['update']:
+            processed = builder.update()
+            if processed is None:
+                self.stdout.write('Индекс не найден или собран с другими '
+                                  'параметрами, выполняется полная сборка.')
+        if processed is None:
+            processed = builder.build()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс похожих рецептов обновлён: {processed} рецептов '
+            f'за {time.monotonic() - started:.2f} с.'))
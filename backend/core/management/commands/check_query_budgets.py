@@ -0,0 +1,162 @@
+import io
+import tempfile
+
+from api.paginations import LimitPageNumberPagination
+from api.urls import router_v1
+from core.query_budget import (check_queries, diff_queries, format_queries,
+                               get_route_url, iter_get_routes, measure_request)
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from recipes.models import Follow, Recipe, ShoppingCard
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+CART_SIZE = 10
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'query-budgets',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ('Проверяет бюджеты SQL-запросов для всех GET-маршрутов '
+            'router_v1 на двух объёмах данных. Бюджеты задаются атрибутом '
+            'query_budgets вьюсетов, замер идёт с холодными кэшами. '
+            'Изменения в БД откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs=2, default=(200, 1000),
+            metavar=('SMALL', 'LARGE'),
+            help='Сколько рецептов добавить seed_foodgram к двум замерам.')
+        parser.add_argument(
+            '--page-sizes', type=int, nargs='+',
+            default=(1, LimitPageNumberPagination.max_page_size),
+            help='Размеры страниц для списочных маршрутов.')
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Один замер на текущих данных без seed_foodgram.')
+
+    def handle(self, *args, **options):
+        small, large = options['sizes']
+        if options['no_seed']:
+            sizes = (None,)
+        elif 0 < small < large:
+            sizes = (small, large)
+        else:
+            raise CommandError('--sizes: нужно 0 < SMALL < LARGE.')
+        database = router.db_for_write(Recipe)
+        runs = {}
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, CACHES=LOCAL_CACHES,
+                DATABASE_REPLICAS=[]), transaction.atomic(using=database):
+            client = None
+            seeded = 0
+            for size in sizes:
+                if size is not None:
+                    self.seed(size - seeded)
+                    seeded = size
+                if client is None:
+                    client = self.get_client()
+                runs[Recipe.objects.count()] = self.measure(
+                    client, options['page_sizes'])
+            transaction.set_rollback(True, using=database)
+        problems = self.report(runs)
+        if problems:
+            raise CommandError(
+                f'Нарушено бюджетов: {problems}.')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
+
+    def seed(self, recipes):
+        call_command('seed_foodgram', recipes=recipes,
+                     users=max(recipes // 5, 10), stdout=io.StringIO())
+
+    def get_client(self):
+        """Клиент пользователя с наибольшим числом подписок."""
+        follower = Follow.objects.values('user_id').annotate(
+            follows=Count('id')).order_by('-follows').first()
+        if follower is None:
+            raise CommandError('В базе нет подписок, выполните seed_foodgram.')
+        user = User.objects.get(pk=follower['user_id'])
+        ShoppingCard.objects.bulk_create([
+            ShoppingCard(user=user, recipe_id=pk)
+            for pk in Recipe.objects.order_by('-pub_date').values_list(
+                'pk', flat=True)[:CART_SIZE]
+        ], ignore_conflicts=True)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token {}'.format(
+            Token.objects.get_or_create(user=user)[0].key))
+        self.user = user
+        return client
+
+    def get_instance(self, viewset):
+        model = viewset.queryset.model
+        if model is User:
+            return self.user
+        return model.objects.order_by('pk').first()
+
+    def measure(self, client, page_sizes):
+        """Замеры маршрутов: {(метка, параметры): (бюджет, статус, SQL)}."""
+        results = {}
+        for viewset, action, url_name, detail in iter_get_routes(router_v1):
+            label = f'{viewset.__name__}.{action}'
+            budget = getattr(viewset, 'query_budgets', {}).get(action)
+            params = budget.get_params() if budget else {}
+            url = get_route_url(
+                viewset, url_name, detail, self.get_instance(viewset))
+            variants = [{}] if detail else [
+                {'limit': page_size} for page_size in page_sizes]
+            for variant in variants:
+                key = (label, ' '.join(
+                    f'{name}={value}' for name, value in variant.items()))
+                results[key] = (budget, *measure_request(
+                    client, url, {**params, **variant}))
+        return results
+
+    def report(self, runs):
+        """Печатает итоги по маршрутам и возвращает число нарушений."""
+        problems = 0
+        sizes = list(runs)
+        for key in runs[sizes[0]]:
+            label = ' '.join(filter(None, key))
+            budget = runs[sizes[0]][key][0]
+            measured = [runs[size][key] for size in sizes]
+            counts = ', '.join(
+                f'{size}: {len(queries)}'
+                for size, (_, _, queries) in zip(sizes, measured))
+            errors = []
+            if budget is None:
+                errors.append('бюджет не задан')
+            for size, (_, status_code, queries) in zip(sizes, measured):
+                if status_code >= 400:
+                    errors.append(f'ответ {status_code} ({size})')
+                if budget is not None:
+                    errors.extend(
+                        f'{error} ({size})'
+                        for error in check_queries(
+                            queries, budget.max_queries,
+                            budget.allow_duplicates))
+            first, last = measured[0][2], measured[-1][2]
+            if len(first) != len(last):
+                errors.append('число запросов растёт с объёмом данных')
+            limit = budget.max_queries if budget else '-'
+            if not errors:
+                self.stdout.write(f'OK    {label}: {counts} / {limit}')
+                continue
+            problems += 1
+            self.stdout.write(self.style.ERROR(
+                f'FAIL  {label}: {counts} / {limit}: {"; ".join(errors)}'))
+            if len(first) != len(last):
+                self.stdout.write(diff_queries(
+                    first, last, str(sizes[0]), str(sizes[-1])))
+            else:
+                self.stdout.write(format_queries(last))
+        return problems
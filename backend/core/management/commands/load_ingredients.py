@@ -1,35 +1,167 @@
+import csv
 import json
+import time
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
-from django.db.utils import IntegrityError
-from recipes.models import Ingredient
+from core.catalog_cache import invalidate_catalog
+from core.response_cache import invalidate_response_tags
+from core.shopping_cart import invalidate_recipe_shopping_carts
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Ingredient, RecipeIngredient
+
+READ_CHUNK_SIZE = 64 * 1024
+FORMATS = ('csv', 'json')
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if len(row) < 2 or row[:2] == ['name', 'measurement_unit']:
+            continue
+        yield row[0], row[1]
+
+
+def iter_json(file):
+    """Построчно отдаёт объекты из JSON-массива, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise CommandError('Ожидался JSON-массив ингредиентов.')
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON в файле ингредиентов.')
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = end
+        yield item['name'], item['measurement_unit']
+
+
+def upsert_batch(batch, loaded):
+    """Добавляет новые пары название/единица и меняет единицу существующих.
+
+    Единица меняется у самой ранней строки с этим названием, только если
+    в файле у названия одна единица и её ещё нет в базе. Названия с
+    несколькими единицами, в том числе из прошлых пачек (``loaded``),
+    добавляются отдельными строками. Возвращает id изменённых
+    ингредиентов.
+    """
+    incoming = defaultdict(dict)
+    for ingredient in batch:
+        incoming[ingredient.name][ingredient.measurement_unit] = None
+    existing = defaultdict(list)
+    for ingredient in Ingredient.objects.filter(
+            name__in=incoming).order_by('pk'):
+        existing[ingredient.name].append(ingredient)
+    created = []
+    changed = []
+    for name, units in incoming.items():
+        rows = existing[name]
+        known = {row.measurement_unit for row in rows}
+        missing = [unit for unit in units if unit not in known]
+        if rows and len(units) == 1 and missing and name not in loaded:
+            rows[0].measurement_unit = missing[0]
+            changed.append(rows[0])
+        else:
+            created.extend(Ingredient(name=name, measurement_unit=unit)
+                           for unit in missing)
+    loaded.update(incoming)
+    Ingredient.objects.bulk_create(created, ignore_conflicts=True)
+    Ingredient.objects.bulk_update(changed, ('measurement_unit',))
+    return [ingredient.pk for ingredient in changed]
 
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=str(Path(settings.BASE_DIR) / 'data' / 'ingredients.json'),
+            help='Путь к файлу с ингредиентами.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одной вставке.')
+        parser.add_argument(
+            '--upsert', action='store_true',
+            help='Обновлять единицу измерения у ингредиентов с тем же '
+                 'названием вместо добавления новой строки.')
 
     def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path.name}.')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
         try:
-            with open('data/ingredients.json', encoding='utf-8') as json_file:
-                data = json.load(json_file)
+            file = path.open(encoding='utf-8', newline='')
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR('Файл не найден.'))
             return
 
-        ingredients_to_create = []
-        for ingredient in data:
-            ingredients_to_create.append(
-                Ingredient(
-                    name=ingredient['name'],
-                    measurement_unit=ingredient['measurement_unit']
-                )
+        parse = iter_csv if file_format == 'csv' else iter_json
+        existed = Ingredient.objects.count()
+        processed = 0
+        updated = []
+        loaded = set()
+        started = time.monotonic()
+        with file:
+            rows = (
+                Ingredient(name=name.strip(),
+                           measurement_unit=measurement_unit.strip())
+                for name, measurement_unit in parse(file)
+                if name.strip() and measurement_unit.strip()
             )
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                if options['upsert']:
+                    updated.extend(upsert_batch(batch, loaded))
+                else:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True)
+                processed += len(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Обработано строк: {processed}')
+        invalidate_catalog('ingredients')
+        if updated:
+            invalidate_response_tags('ingredients')
+            invalidate_recipe_shopping_carts(*RecipeIngredient.objects.filter(
+                ingredient_id__in=updated).values_list(
+                    'recipe_id', flat=True).distinct())
 
-        try:
-            Ingredient.objects.bulk_create(ingredients_to_create)
-            self.stdout.write(self.style.SUCCESS(
-                'Ингридиенты успешно импортированы.')
-            )
-        except IntegrityError as e:
-            self.stdout.write(self.style.ERROR(
-                'Ошибка импорта ингридиентов: {}'.format(str(e)))
-            )
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - existed
+        skipped = processed - created - len(updated)
+        throughput = processed / elapsed if elapsed else processed
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингридиенты успешно импортированы: обработано {processed}, '
+            f'добавлено {created}, обновлено {len(updated)}, '
+            f'пропущено {skipped} '
+            f'за {elapsed:.2f} с ({throughput:.0f} строк/с).'
+        ))
@@ -0,0 +1,15 @@
+from core.counters import recount_all
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, списков покупок, '
+            'рецептов и подписчиков.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes, users = recount_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны: рецептов {recipes}, '
+            f'пользователей {users}.'))
@@ -0,0 +1,27 @@
+import time
+
+from core.ranking import refresh_scores
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки popular и trending для рецептов, '
+            'у которых появились новые добавления в избранное или '
+            'список покупок. Запускается по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать оценки всех рецептов.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество рецептов в одном обновлении.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        started = time.monotonic()
+        refreshed = refresh_scores(options['full'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценки пересчитаны: {refreshed} рецептов '
+            f'за {time.monotonic() - started:.2f} с.'))
@@ -0,0 +1,275 @@
+import csv
+import io
+import time
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from core.catalog_cache import invalidate_catalog
+from core.counters import recount_all
+from core.ranking import refresh_scores
+from core.response_cache import invalidate_response_tags
+from core.search import update_search_vectors
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.utils import timezone
+from PIL import Image
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCard, Tag, TagRecipe)
+
+User = get_user_model()
+
+SEED_IMAGE = 'recipes/seed.png'
+SEED_PASSWORD = 'seed-password'
+MIN_INGREDIENTS = 5
+MAX_INGREDIENTS = 40
+DISHES = ('Суп', 'Салат', 'Пирог', 'Рагу', 'Омлет', 'Паста', 'Каша',
+          'Запеканка', 'Плов', 'Котлеты', 'Блины', 'Борщ')
+ADJECTIVES = ('домашний', 'быстрый', 'летний', 'пряный', 'сытный',
+              'бабушкин', 'постный', 'праздничный', 'острый', 'нежный')
+STEPS = ('Нарежьте овощи.', 'Разогрейте сковороду.', 'Смешайте продукты.',
+         'Доведите до кипения.', 'Запекайте 30 минут.', 'Посолите.',
+         'Подавайте горячим.', 'Оставьте настояться.')
+
+
+def zipf_weights(size, exponent):
+    weights = 1 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+def insert_rows(model, fields, rows, batch_size):
+    """Вставляет строки через COPY на PostgreSQL и пачками в остальных БД."""
+    database = router.db_for_write(model)
+    connection = connections[database]
+    if connection.vendor != 'postgresql':
+        for start in range(0, len(rows), batch_size):
+            model.objects.using(database).bulk_create(
+                [model(**dict(zip(fields, row)))
+                 for row in rows[start:start + batch_size]],
+                ignore_conflicts=True)
+        return
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows[start:start + batch_size])
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {quote(model._meta.db_table)} ({columns}) '
+                f'FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, подписками, '
+            'рецептами, избранным и списками покупок для замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей.')
+        parser.add_argument(
+            '--recipes', type=int, default=5000,
+            help='Количество рецептов.')
+        parser.add_argument(
+            '--tags', type=int, default=12,
+            help='Сколько тегов должно быть в базе.')
+        parser.add_argument(
+            '--max-follows', type=int, default=300,
+            help='Максимум подписок у одного пользователя.')
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число рецептов в избранном у пользователя.')
+        parser.add_argument(
+            '--carts', type=float, default=5,
+            help='Среднее число рецептов в списке покупок.')
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель степенного распределения популярности.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикации.')
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Начальное значение генератора случайных чисел.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Количество строк в одной вставке.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно хотя бы 2 пользователя и 1 рецепт.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if len(ingredient_ids) < MAX_INGREDIENTS:
+            raise CommandError(
+                f'Нужно хотя бы {MAX_INGREDIENTS} ингредиентов, '
+                f'сначала выполните load_ingredients.')
+        self.rng = np.random.default_rng(options['seed'])
+        self.options = options
+        self.prefix = f'seed-{uuid.uuid4().hex[:8]}'
+        started = time.monotonic()
+        self.ensure_image()
+        with transaction.atomic():
+            tag_ids = self.create_tags()
+            user_ids = self.create_users()
+            recipe_ids = self.create_recipes(user_ids)
+            counts = {
+                'ингредиентов в рецептах': self.create_recipe_ingredients(
+                    recipe_ids, ingredient_ids),
+                'тегов рецептов': self.create_recipe_tags(
+                    recipe_ids, tag_ids),
+                'подписок': self.create_follows(user_ids),
+                'избранного': self.create_user_recipes(
+                    Favorite, user_ids, recipe_ids, options['favorites']),
+                'в списках покупок': self.create_user_recipes(
+                    ShoppingCard, user_ids, recipe_ids, options['carts']),
+            }
+            recount_all()
+        update_search_vectors(*recipe_ids)
+        refresh_scores(full=True, batch_size=options['batch_size'])
+        invalidate_catalog('recipes')
+        invalidate_catalog('tags')
+        invalidate_response_tags('recipes', 'tags')
+        summary = ', '.join(
+            f'{name} {count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано с префиксом {self.prefix}: пользователей '
+            f'{len(user_ids)}, рецептов {len(recipe_ids)}, {summary} '
+            f'за {time.monotonic() - started:.2f} с.'))
+
+    def ensure_image(self):
+        if default_storage.exists(SEED_IMAGE):
+            return
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (230, 180, 80)).save(buffer, 'PNG')
+        default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+
+    def create_tags(self):
+        missing = self.options['tags'] - Tag.objects.count()
+        Tag.objects.bulk_create([
+            Tag(name=f'{self.prefix} {index}',
+                color='#{:06x}'.format(int(self.rng.integers(0, 1 << 24))),
+                slug=f'{self.prefix}-{index}')
+            for index in range(max(missing, 0))
+        ], ignore_conflicts=True)
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_users(self):
+        password = make_password(SEED_PASSWORD)
+        User.objects.bulk_create([
+            User(username=f'{self.prefix}-{index}',
+                 email=f'{self.prefix}-{index}@seed.foodgram',
+                 first_name='Пользователь', last_name=str(index),
+                 password=password)
+            for index in range(self.options['users'])
+        ], batch_size=self.options['batch_size'])
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}-').order_by(
+            'pk').values_list('pk', flat=True))
+
+    def create_recipes(self, user_ids):
+        """Рецепты по авторам со степенным распределением.
+
+        Даты публикации проставляются отдельным bulk_update: bulk_create
+        перезаписывает поля с auto_now_add текущим временем.
+        """
+        count = self.options['recipes']
+        authors = self.rng.choice(
+            user_ids, size=count,
+            p=zipf_weights(len(user_ids), self.options['exponent']))
+        now = timezone.now()
+        seconds = self.rng.integers(
+            0, self.options['days'] * 24 * 3600, size=count)
+        recipes = []
+        dates = []
+        for index, (author_id, age) in enumerate(zip(authors, seconds)):
+            dish = DISHES[index % len(DISHES)]
+            adjective = ADJECTIVES[
+                int(self.rng.integers(0, len(ADJECTIVES)))]
+            steps = self.rng.choice(STEPS, size=4, replace=False)
+            dates.append(now - timedelta(seconds=int(age)))
+            recipes.append(Recipe(
+                author_id=int(author_id),
+                name=f'{dish} {adjective} #{index}',
+                text=' '.join(steps),
+                cooking_time=int(self.rng.integers(5, 180)),
+                image=SEED_IMAGE,
+            ))
+        batch_size = self.options['batch_size']
+        Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+        created = {
+            (author_id, name): pk
+            for pk, author_id, name in Recipe.objects.filter(
+                author__username__startswith=f'{self.prefix}-').values_list(
+                'pk', 'author_id', 'name')
+        }
+        for recipe, published in zip(recipes, dates):
+            recipe.pk = created[recipe.author_id, recipe.name]
+            recipe.pub_date = recipe.updated = published
+        Recipe.objects.bulk_update(recipes, ('pub_date', 'updated'),
+                                   batch_size=batch_size)
+        return [recipe.pk for recipe in recipes]
+
+    def create_recipe_ingredients(self, recipe_ids, ingredient_ids):
+        weights = zipf_weights(len(ingredient_ids), self.options['exponent'])
+        rows = []
+        for recipe_id in recipe_ids:
+            size = int(self.rng.integers(MIN_INGREDIENTS, MAX_INGREDIENTS + 1))
+            for ingredient_id in self.rng.choice(
+                    ingredient_ids, size=size, replace=False, p=weights):
+                rows.append((int(ingredient_id), recipe_id,
+                             int(self.rng.integers(1, 500))))
+        insert_rows(RecipeIngredient, ('ingredient_id', 'recipe_id',
+                                       'amount'), rows,
+                    self.options['batch_size'])
+        return len(rows)
+
+    def create_recipe_tags(self, recipe_ids, tag_ids):
+        rows = []
+        for recipe_id in recipe_ids:
+            size = int(self.rng.integers(1, min(3, len(tag_ids)) + 1))
+            rows.extend((int(tag_id), recipe_id) for tag_id in self.rng.choice(
+                tag_ids, size=size, replace=False))
+        insert_rows(TagRecipe, ('tag_id', 'recipe_id'), rows,
+                    self.options['batch_size'])
+        return len(rows)
+
+    def create_follows(self, user_ids):
+        """Подписки: число подписок и популярность авторов по Ципфу."""
+        weights = zipf_weights(len(user_ids), self.options['exponent'])
+        limit = min(self.options['max_follows'], len(user_ids) - 1)
+        rows = []
+        for user_id in user_ids:
+            size = min(limit, int(self.rng.pareto(1.2)) + 1)
+            authors = [
+                int(author_id) for author_id in self.rng.choice(
+                    user_ids, size=size + 1, replace=False, p=weights)
+                if author_id != user_id
+            ]
+            rows.extend((user_id, author_id) for author_id in authors[:size])
+        insert_rows(Follow, ('user_id', 'author_id'), rows,
+                    self.options['batch_size'])
+        return len(rows)
+
+    def create_user_recipes(self, model, user_ids, recipe_ids, mean):
+        weights = zipf_weights(len(recipe_ids), self.options['exponent'])
+        order = self.rng.permutation(recipe_ids)
+        now = timezone.now()
+        rows = []
+        for user_id in user_ids:
+            size = min(len(recipe_ids), int(self.rng.poisson(mean)))
+            for recipe_id in self.rng.choice(
+                    order, size=size, replace=False, p=weights):
+                created = now - timedelta(
+                    seconds=int(self.rng.integers(0, 14 * 24 * 3600)))
+                rows.append((user_id, int(recipe_id), created))
+        insert_rows(model, ('user_id', 'recipe_id', 'created'), rows,
+                    self.options['batch_size'])
+        return len(rows)
@@ -0,0 +1,379 @@
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission, IsAdminUser
+
+logger = logging.getLogger('foodgram.slow_requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500)
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Полное время обработки запроса.', DURATION_BUCKETS),
+    'foodgram_request_sql_duration_seconds': (
+        'Суммарное время SQL-запросов за запрос.', DURATION_BUCKETS),
+    'foodgram_request_serializer_duration_seconds': (
+        'Время сериализации ответа.', DURATION_BUCKETS),
+    'foodgram_request_sql_queries': (
+        'Число SQL-запросов за запрос.', QUERY_BUCKETS),
+    'foodgram_request_serializer_sql_queries': (
+        'Число SQL-запросов из сериализаторов за запрос.', QUERY_BUCKETS),
+}
+COUNTERS = {
+    'foodgram_requests_total': 'Число обработанных запросов.',
+}
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...), ...'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = []
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_queries = 0
+        self.serializer_depth = 0
+        self.lock = threading.Lock()
+
+    def add_query(self, sql, duration):
+        with self.lock:
+            self.queries.append((sql, duration))
+            self.sql_time += duration
+
+
+current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper всех соединений, см. ``install_query_recorder``."""
+    stats = current_stats.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Подключает record_query к каждому новому соединению.
+
+    Соединения принадлежат потокам, а async-представления выполняют
+    запросы в пулах потоков, поэтому обёртка ставится один раз на
+    соединение, а запрос находится через ``current_stats``.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure_serializer():
+    """Учитывает время внешнего вызова сериализатора в текущем запросе."""
+    stats = current_stats.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    queries = len(stats.queries)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        stats.serializer_time += time.perf_counter() - started
+        stats.serializer_queries += len(stats.queries) - queries
+
+
+class InstrumentedSerializerMixin:
+    def to_representation(self, instance):
+        with measure_serializer():
+            return super().to_representation(instance)
+
+
+def get_fingerprint(sql):
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    sql = sql.strip()
+    return hashlib.md5(sql.encode()).hexdigest()[:12], sql
+
+
+class Registry:
+    """Гистограммы и счётчики процесса с выгрузкой в общий каталог.
+
+    Каждый воркер gunicorn раз в ``METRICS_FLUSH_INTERVAL`` секунд
+    атомарно пишет свой снимок в ``METRICS_DIR/<pid>.json``; эндпоинт
+    метрик складывает снимки всех воркеров со своим текущим состоянием.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = defaultdict(int)
+        self.flushed_at = 0.0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            data = self.histograms.get((name, labels))
+            if data is None:
+                data = [0] * (len(buckets) + 1) + [0.0]
+                self.histograms[name, labels] = data
+            data[bisect_left(buckets, value)] += 1
+            data[-1] += value
+
+    def increment(self, name, labels):
+        with self.lock:
+            self.counters[name, labels] += 1
+
+    def record(self, view, method, status, stats, duration):
+        labels = (('view', view), ('method', method))
+        self.increment('foodgram_requests_total',
+                       labels + (('status', str(status)),))
+        for name, value in (
+                ('foodgram_request_duration_seconds', duration),
+                ('foodgram_request_sql_duration_seconds', stats.sql_time),
+                ('foodgram_request_serializer_duration_seconds',
+                 stats.serializer_time),
+                ('foodgram_request_sql_queries', len(stats.queries)),
+                ('foodgram_request_serializer_sql_queries',
+                 stats.serializer_queries)):
+            self.observe(name, labels, value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': [[name, labels, list(data)] for (
+                    name, labels), data in self.histograms.items()],
+                'counters': [[name, labels, value] for (
+                    name, labels), value in self.counters.items()],
+            }
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+                not force
+                and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.flushed_at = now
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary = directory / f'.{os.getpid()}.json.tmp'
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, directory / f'{os.getpid()}.json')
+
+    def collect(self):
+        """Снимки всех воркеров, включая текущий процесс."""
+        snapshots = [self.snapshot()]
+        if not settings.METRICS_DIR:
+            return snapshots
+        own = f'{os.getpid()}.json'
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            if path.name == own:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+registry = Registry()
+
+
+def merge_snapshots(snapshots):
+    histograms = {}
+    counters = defaultdict(int)
+    for snapshot in snapshots:
+        for name, labels, data in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [
+                    left + right
+                    for left, right in zip(histograms[key], data)]
+            else:
+                histograms[key] = list(data)
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+    return histograms, counters
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for name, value in labels)
+
+
+def render_metrics(snapshots):
+    histograms, counters = merge_snapshots(snapshots)
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{{{format_labels(labels)}}} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), data in sorted(histograms.items()):
+            if metric != name:
+                continue
+            total = 0
+            for bound, count in zip(buckets + ('+Inf',), data):
+                total += count
+                bucket_labels = format_labels(labels + (('le', bound),))
+                lines.append(f'{name}_bucket{{{bucket_labels}}} {total}')
+            lines.append(f'{name}_sum{{{format_labels(labels)}}} {data[-1]}')
+            lines.append(f'{name}_count{{{format_labels(labels)}}} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+class HasMetricsToken(BasePermission):
+    """Заголовок ``Authorization: Bearer <METRICS_TOKEN>`` для сборщика."""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        return bool(token) and hmac.compare_digest(
+            request.headers.get('Authorization', '').encode(),
+            f'Bearer {token}'.encode())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | HasMetricsToken])
+def metrics_view(request):
+    registry.flush(force=True)
+    return HttpResponse(render_metrics(registry.collect()),
+                        content_type='text/plain; version=0.0.4')
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    view = getattr(match.func, 'cls', None)
+    if view is None:
+        return match.view_name or match._func_path
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view.__name__}.{action}'
+
+
+def get_slow_queries(stats):
+    queries = {}
+    for sql, duration in stats.queries:
+        fingerprint, normalized = get_fingerprint(sql)
+        entry = queries.setdefault(fingerprint, {
+            'fingerprint': fingerprint, 'count': 0, 'total_ms': 0.0,
+            'sql': normalized[:settings.METRICS_SLOW_REQUEST_SQL_LENGTH]})
+        entry['count'] += 1
+        entry['total_ms'] += duration * 1000
+    ranked = sorted(queries.values(), key=lambda entry: entry['total_ms'],
+                    reverse=True)[:settings.METRICS_SLOW_REQUEST_TOP_QUERIES]
+    for entry in ranked:
+        entry['total_ms'] = round(entry['total_ms'], 2)
+    return ranked
+
+
+class MetricsMiddleware:
+    """Собирает число и время SQL, время сериализации и ответа по вьюхам.
+
+    Запросы дольше ``METRICS_SLOW_REQUEST_THRESHOLD`` секунд пишутся в лог
+    ``foodgram.slow_requests`` одной JSON-строкой с самыми дорогими
+    отпечатками SQL: повторяющийся отпечаток с большим ``count`` обычно
+    означает N+1.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        started = time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.process_response(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        started = time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.process_response(request, response, stats, started)
+
+    def process_response(self, request, response, stats, started):
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, stats,
+                started)
+        else:
+            self.finish(request, response, stats, started)
+        return response
+
+    def stream(self, content, request, response, stats, started):
+        current_stats.set(stats)
+        try:
+            yield from content
+        finally:
+            current_stats.set(None)
+            self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        duration = time.perf_counter() - started
+        view = get_view_name(request)
+        registry.record(view, request.method, response.status_code, stats,
+                        duration)
+        if duration >= settings.METRICS_SLOW_REQUEST_THRESHOLD:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'sql_queries': len(stats.queries),
+                'sql_ms': round(stats.sql_time * 1000, 2),
+                'serializer_ms': round(stats.serializer_time * 1000, 2),
+                'serializer_queries': stats.serializer_queries,
+                'top_queries': get_slow_queries(stats),
+            }, ensure_ascii=False))
+        registry.flush()
@@ -0,0 +1,20 @@
+class MaintainedFieldsMixin:
+    """Не даёт обычному save() затереть поддерживаемые поля.
+
+    Поля из ``maintained_fields`` (счётчики, поисковый вектор) меняются
+    только отдельными UPDATE, поэтому при сохранении уже существующей
+    строки они исключаются из запроса.
+    """
+
+    maintained_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.maintained_fields
+            ]
+        super().save(*args, **kwargs)
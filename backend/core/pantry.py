@@ -0,0 +1,172 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from core.catalog_cache import get_catalog_version
+from core.replicas import use_primary
+from django.conf import settings
+from django.utils import timezone
+from recipes.models import Recipe, RecipeIngredient
+
+WORD_BITS = 64
+SWAR_MASKS = tuple(np.uint64(mask) for mask in (
+    0x5555555555555555, 0x3333333333333333, 0x0f0f0f0f0f0f0f0f,
+    0x0101010101010101))
+
+
+def popcount(words):
+    """Число единичных битов в каждом элементе массива uint64."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    ones, twos, nibbles, bytes_sum = SWAR_MASKS
+    words = words - ((words >> np.uint64(1)) & ones)
+    words = (words & twos) + ((words >> np.uint64(2)) & twos)
+    words = (words + (words >> np.uint64(4))) & nibbles
+    return (words * bytes_sum) >> np.uint64(56)
+
+
+def load_ingredients(recipe_ids=None):
+    rows = RecipeIngredient.objects.all()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id in rows.values_list(
+            'recipe_id', 'ingredient_id').iterator():
+        ingredients[recipe_id].append(ingredient_id)
+    return ingredients
+
+
+def fill_bits(matrix, row_indexes, ingredient_lists, columns):
+    rows = []
+    bits = []
+    for row, ingredient_ids in zip(row_indexes, ingredient_lists):
+        rows.extend([row] * len(ingredient_ids))
+        bits.extend(columns[pk] for pk in ingredient_ids)
+    if not bits:
+        return
+    bits = np.array(bits, dtype=np.int64)
+    np.bitwise_or.at(
+        matrix, (bits // WORD_BITS, np.array(rows, dtype=np.int64)),
+        np.left_shift(np.uint64(1), (bits % WORD_BITS).astype(np.uint64)))
+
+
+class PantryIndex:
+    """Битовые множества ингредиентов рецептов в памяти воркера.
+
+    Матрица хранится по словам: строка — 64 ингредиента, столбец —
+    рецепт. Для набора продуктов пользователя совпадения считаются для
+    всех рецептов сразу через AND и popcount, и только по тем словам,
+    где есть продукты из запроса. При смене версии ``recipes``
+    перечитываются только рецепты, изменённые после прошлой
+    синхронизации; удаление рецептов или новый ингредиент приводят
+    к полной перестройке.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.synced_at = None
+        self.state = (np.zeros(0, dtype=np.int64), {},
+                      np.zeros((1, 0), dtype=np.uint64),
+                      np.zeros(0, dtype=np.int32), {})
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = get_catalog_version('recipes')
+        if version == self.version:
+            return
+        with self.lock, use_primary():
+            if version == self.version:
+                return
+            started = timezone.now()
+            if self.synced_at is None or not self.apply_changes(
+                    self.synced_at - timedelta(
+                        seconds=settings.PANTRY_SYNC_OVERLAP)):
+                self.rebuild()
+            self.synced_at = started
+            self.version = version
+
+    def rebuild(self):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        ingredients = load_ingredients()
+        columns = {
+            pk: index for index, pk in enumerate(sorted(
+                {pk for ingredient_ids in ingredients.values()
+                 for pk in ingredient_ids}))
+        }
+        words = max(1, -(-len(columns) // WORD_BITS))
+        matrix = np.zeros((words, len(recipe_ids)), dtype=np.uint64)
+        lists = [ingredients.get(pk, []) for pk in recipe_ids]
+        fill_bits(matrix, range(len(recipe_ids)), lists, columns)
+        self.state = (
+            np.array(recipe_ids, dtype=np.int64),
+            {pk: row for row, pk in enumerate(recipe_ids)},
+            matrix,
+            np.array([len(ingredient_ids) for ingredient_ids in lists],
+                     dtype=np.int32),
+            columns,
+        )
+
+    def apply_changes(self, since):
+        recipe_ids, rows, matrix, required, columns = self.state
+        changed = list(Recipe.objects.filter(
+            updated__gte=since).values_list('pk', flat=True))
+        added = [pk for pk in changed if pk not in rows]
+        if Recipe.objects.count() != len(rows) + len(added):
+            return False
+        ingredients = load_ingredients(changed)
+        if any(pk not in columns for ingredient_ids in ingredients.values()
+               for pk in ingredient_ids):
+            return False
+        if not changed:
+            return True
+        rows = dict(rows)
+        for pk in added:
+            rows[pk] = len(rows)
+        recipe_ids = np.concatenate(
+            (recipe_ids, np.array(added, dtype=np.int64)))
+        matrix = np.concatenate(
+            (matrix, np.zeros((matrix.shape[0], len(added)),
+                              dtype=np.uint64)), axis=1)
+        required = np.concatenate(
+            (required, np.zeros(len(added), dtype=np.int32)))
+        changed_rows = [rows[pk] for pk in changed]
+        matrix[:, changed_rows] = 0
+        lists = [ingredients.get(pk, []) for pk in changed]
+        required[changed_rows] = [len(ingredient_ids)
+                                  for ingredient_ids in lists]
+        fill_bits(matrix, changed_rows, lists, columns)
+        self.state = (recipe_ids, rows, matrix, required, columns)
+        return True
+
+    def search(self, ingredient_ids, limit):
+        """Список (id рецепта, число недостающих ингредиентов).
+
+        Рецепты без единого совпадения не возвращаются. Сначала идут
+        рецепты с наименьшим числом недостающих ингредиентов, затем с
+        наибольшим числом совпавших, затем более новые.
+        """
+        self.refresh()
+        recipe_ids, _, matrix, required, columns = self.state
+        bits = [columns[pk] for pk in set(ingredient_ids) if pk in columns]
+        if not bits:
+            return []
+        query = defaultdict(lambda: np.uint64(0))
+        for bit in bits:
+            query[bit // WORD_BITS] |= np.uint64(1) << np.uint64(
+                bit % WORD_BITS)
+        have = np.zeros(len(recipe_ids), dtype=np.int32)
+        for word, mask in query.items():
+            have += popcount(matrix[word] & mask).astype(np.int32)
+        missing = required - have
+        candidates = np.flatnonzero(have > 0)
+        if len(candidates) > limit:
+            threshold = np.partition(missing[candidates], limit - 1)[limit - 1]
+            candidates = candidates[missing[candidates] <= threshold]
+        order = candidates[np.lexsort((
+            -recipe_ids[candidates], -have[candidates],
+            missing[candidates]))][:limit]
+        return [(int(recipe_ids[row]), int(missing[row])) for row in order]
+
+
+pantry_index = PantryIndex()
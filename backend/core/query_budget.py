@@ -0,0 +1,126 @@
+import difflib
+from collections import Counter
+from contextlib import contextmanager
+
+from core import catalog_cache, response_cache
+from core.autocomplete import ingredient_index
+from core.metrics import get_fingerprint
+from core.pantry import pantry_index
+from core.search import recipe_index
+from core.similar import similar_index
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class QueryBudget:
+    """Допустимое число SQL-запросов для действия вьюсета.
+
+    Объявляется в атрибуте ``query_budgets`` вьюсета по имени действия.
+    ``params`` — параметры запроса или функция, которая их возвращает.
+    """
+
+    def __init__(self, max_queries, allow_duplicates=False, params=None):
+        self.max_queries = max_queries
+        self.allow_duplicates = allow_duplicates
+        self.params = params
+
+    def get_params(self):
+        if callable(self.params):
+            return self.params()
+        return dict(self.params or {})
+
+
+def normalize_queries(queries):
+    return [get_fingerprint(query['sql'])[1] for query in queries]
+
+
+def get_duplicates(queries):
+    return {sql: count for sql, count in Counter(
+        normalize_queries(queries)).items() if count > 1}
+
+
+def format_queries(queries):
+    normalized = normalize_queries(queries)
+    counts = Counter(normalized)
+    return '\n'.join(
+        f'{number:>4}. {"[x%d] " % counts[sql] if counts[sql] > 1 else ""}'
+        f'{sql}'
+        for number, sql in enumerate(normalized, 1))
+
+
+def diff_queries(before, after, before_label, after_label):
+    return '\n'.join(difflib.unified_diff(
+        normalize_queries(before), normalize_queries(after),
+        before_label, after_label, lineterm=''))
+
+
+def check_queries(queries, max_queries, allow_duplicates=False):
+    """Список нарушений бюджета для снятых CaptureQueriesContext запросов."""
+    problems = []
+    if len(queries) > max_queries:
+        problems.append(
+            f'{len(queries)} запросов при бюджете {max_queries}')
+    duplicates = get_duplicates(queries)
+    if duplicates and not allow_duplicates:
+        problems.append(
+            f'повторяющиеся запросы: {sum(duplicates.values())} '
+            f'по {len(duplicates)} шаблонам')
+    return problems
+
+
+@contextmanager
+def query_budget(max_queries, allow_duplicates=False,
+                 using=DEFAULT_DB_ALIAS):
+    """Проверяет число запросов в блоке, см. api.tests.test_query_budgets."""
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+    problems = check_queries(
+        captured.captured_queries, max_queries, allow_duplicates)
+    if problems:
+        raise AssertionError(
+            '; '.join(problems) + '\n'
+            + format_queries(captured.captured_queries))
+
+
+def reset_caches():
+    """Сбрасывает кэши, чтобы замер шёл по холодному пути.
+
+    Индексы в памяти воркера синхронизируются сразу: их перестройка
+    происходит при смене версии справочника, а не в каждом запросе.
+    """
+    for cache in caches.all():
+        cache.clear()
+    catalog_cache.local_cache.clear()
+    response_cache.local_cache.clear()
+    for index in (ingredient_index, pantry_index, recipe_index,
+                  similar_index):
+        index.refresh()
+
+
+def iter_get_routes(router):
+    """GET-маршруты роутера: (вьюсет, действие, имя url, detail)."""
+    for _, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            action = router.get_method_map(viewset, route.mapping).get('get')
+            if action is not None:
+                yield (viewset, action, route.name.format(basename=basename),
+                       route.detail)
+
+
+def get_route_url(viewset, url_name, detail, instance):
+    if not detail:
+        return reverse(url_name)
+    lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+    return reverse(url_name, kwargs={lookup: instance.pk})
+
+
+def measure_request(client, url, params, using=DEFAULT_DB_ALIAS):
+    """Статус ответа и запросы холодного GET, включая потоковое тело."""
+    reset_caches()
+    with CaptureQueriesContext(connections[using]) as captured:
+        response = client.get(url, params)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response.status_code, captured.captured_queries
@@ -0,0 +1,91 @@
+import math
+from collections import defaultdict
+
+from core.response_cache import invalidate_response_tags
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, RecipeScore, ShoppingCard
+
+
+def get_decay_rate():
+    return math.log(2) / (settings.RECIPE_TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def get_trending(events, rate):
+    """log(sum(w * 2 ** (t / half_life))) по событиям (вес, время).
+
+    Считается через log-sum-exp, чтобы не переполнять float.
+    """
+    if not events:
+        return 0.0
+    terms = [math.log(weight) + rate * moment for weight, moment in events]
+    peak = max(terms)
+    return peak + math.log(sum(math.exp(term - peak) for term in terms))
+
+
+def get_stale_scores(full=False):
+    scores = RecipeScore.objects.all()
+    if full:
+        return scores
+    return scores.filter(
+        Q(refreshed_at__isnull=True)
+        | ~Q(favorites_count=F('recipe__favorites_count'))
+        | ~Q(in_carts_count=F('recipe__in_carts_count'))
+        | Exists(Favorite.objects.filter(
+            recipe_id=OuterRef('recipe_id'),
+            created__gt=OuterRef('refreshed_at')))
+        | Exists(ShoppingCard.objects.filter(
+            recipe_id=OuterRef('recipe_id'),
+            created__gt=OuterRef('refreshed_at')))
+    )
+
+
+def collect_events(recipe_ids):
+    events = defaultdict(list)
+    sources = (
+        (Favorite, settings.RECIPE_SCORE_FAVORITE_WEIGHT),
+        (ShoppingCard, settings.RECIPE_SCORE_CART_WEIGHT),
+    )
+    for model, weight in sources:
+        for recipe_id, created in model.objects.filter(
+                recipe_id__in=recipe_ids).values_list('recipe_id', 'created'):
+            events[recipe_id].append((weight, created.timestamp()))
+    return events
+
+
+def refresh_scores(full=False, batch_size=1000):
+    """Пересчитывает оценки рецептов, у которых изменились события.
+
+    Возвращает число пересчитанных строк.
+    """
+    RecipeScore.objects.bulk_create(
+        [RecipeScore(recipe_id=pk) for pk in Recipe.objects.filter(
+            score__isnull=True).values_list('pk', flat=True)],
+        batch_size=batch_size, ignore_conflicts=True)
+    refreshed_at = timezone.now()
+    rate = get_decay_rate()
+    stale = list(get_stale_scores(full).values_list('recipe_id', flat=True))
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        events = collect_events(batch)
+        scores = []
+        for recipe_id, favorites_count, in_carts_count in (
+                Recipe.objects.filter(pk__in=batch).values_list(
+                    'pk', 'favorites_count', 'in_carts_count')):
+            scores.append(RecipeScore(
+                recipe_id=recipe_id,
+                popular=(
+                    favorites_count * settings.RECIPE_SCORE_FAVORITE_WEIGHT
+                    + in_carts_count * settings.RECIPE_SCORE_CART_WEIGHT),
+                trending=get_trending(events[recipe_id], rate),
+                favorites_count=favorites_count,
+                in_carts_count=in_carts_count,
+                refreshed_at=refreshed_at,
+            ))
+        RecipeScore.objects.bulk_update(
+            scores, ['popular', 'trending', 'favorites_count',
+                     'in_carts_count', 'refreshed_at'])
+    if stale:
+        invalidate_response_tags('scores')
+    return len(stale)
@@ -0,0 +1,140 @@
+from core.counters import change_counters
+from core.shopping_cart import invalidate_shopping_cart
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, router, transaction
+from recipes.models import Favorite, Follow, Recipe, ShoppingCard
+
+User = get_user_model()
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+class UserRelation:
+    """Массовые и одиночные изменения связей пользователя.
+
+    Пишут в базу без сигналов моделей (INSERT ... ON CONFLICT DO NOTHING
+    и DELETE ... RETURNING), поэтому счётчики и кэши обновляются здесь же
+    одним запросом на пачку и только по реально изменённым строкам.
+    Кэши (``on_change``) сбрасываются после коммита, чтобы параллельный
+    запрос не собрал их заново из старых строк.
+    """
+
+    def __init__(self, model, field, target, counter, on_change=None,
+                 allow_self=True):
+        self.model = model
+        self.field = field
+        self.target = target
+        self.counter = counter
+        self.on_change = on_change
+        self.allow_self = allow_self
+
+    def changed(self, user, target_ids, delta):
+        if not target_ids:
+            return
+        change_counters(self.target, target_ids, self.counter, delta)
+        if self.on_change is not None:
+            user_id = user.pk
+            transaction.on_commit(
+                lambda: self.on_change(user_id),
+                using=router.db_for_write(self.model))
+
+    def add(self, user, target_ids):
+        """Создаёт связи и возвращает статус для каждого id."""
+        target_ids = list(dict.fromkeys(target_ids))
+        found = set(self.target.objects.filter(
+            pk__in=target_ids).values_list('pk', flat=True))
+        if not self.allow_self:
+            found.discard(user.pk)
+        database = router.db_for_write(self.model)
+        with transaction.atomic(using=database):
+            created = self.insert(
+                database, user, [pk for pk in target_ids if pk in found])
+            self.changed(user, created, 1)
+        created = set(created)
+        return [
+            {'id': pk, 'status': self.get_add_status(
+                user, pk, found, created)}
+            for pk in target_ids
+        ]
+
+    def insert(self, database, user, target_ids):
+        """Вставляет связи и возвращает id, для которых строка добавлена.
+
+        Строки, которые уже есть, в том числе вставленные параллельным
+        запросом, пропускает ON CONFLICT и в результат они не попадают.
+        """
+        if not target_ids:
+            return []
+        connection = connections[database]
+        quote = connection.ops.quote_name
+        fields = [field for field in self.model._meta.concrete_fields
+                  if not field.primary_key]
+        params = []
+        for pk in target_ids:
+            instance = self.model(user=user, **{self.field: pk})
+            params.extend(
+                field.get_db_prep_save(field.pre_save(instance, True),
+                                       connection)
+                for field in fields)
+        columns = ', '.join(quote(field.column) for field in fields)
+        values = f'({", ".join(["%s"] * len(fields))})'
+        column = quote(self.model._meta.get_field(self.field).column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(self.model._meta.db_table)} '
+                f'({columns}) VALUES {", ".join([values] * len(target_ids))} '
+                f'ON CONFLICT DO NOTHING RETURNING {column}', params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_add_status(self, user, pk, found, created):
+        if pk in created:
+            return CREATED
+        if pk in found:
+            return EXISTS
+        if not self.allow_self and pk == user.pk:
+            return SELF
+        return NOT_FOUND
+
+    def add_one(self, user, target_id):
+        """Одна вставка; None, если связь уже была."""
+        try:
+            with transaction.atomic(using=router.db_for_write(self.model)):
+                return self.model.objects.create(
+                    user=user, **{self.field: target_id})
+        except IntegrityError:
+            return None
+
+    def remove(self, user, target_ids):
+        """Удаляет связи одним DELETE и возвращает статус для каждого id."""
+        target_ids = list(dict.fromkeys(target_ids))
+        if not target_ids:
+            return []
+        database = router.db_for_write(self.model)
+        connection = connections[database]
+        quote = connection.ops.quote_name
+        column = quote(self.model._meta.get_field(self.field).column)
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        with transaction.atomic(using=database):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {quote(self.model._meta.db_table)} '
+                    f'WHERE {quote("user_id")} = %s '
+                    f'AND {column} IN ({placeholders}) RETURNING {column}',
+                    [user.pk, *target_ids])
+                removed = [row[0] for row in cursor.fetchall()]
+            self.changed(user, removed, -1)
+        removed = set(removed)
+        return [{'id': pk, 'status': DELETED if pk in removed else ABSENT}
+                for pk in target_ids]
+
+
+favorites = UserRelation(Favorite, 'recipe_id', Recipe, 'favorites_count')
+shopping_cart = UserRelation(ShoppingCard, 'recipe_id', Recipe,
+                             'in_carts_count', invalidate_shopping_cart)
+subscriptions = UserRelation(Follow, 'author_id', User, 'followers_count',
+                             allow_self=False)
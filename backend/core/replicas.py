@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+
+from core.async_db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+current_state = contextvars.ContextVar('database_state', default=None)
+unhealthy = {}
+
+
+class DatabaseState:
+    """Реплика для чтения в текущем запросе; ``None`` — основная БД."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """Чтение безопасных запросов идёт в реплику, выбранную middleware.
+
+    Вне запросов (команды, фоновые задачи) и после первой записи в
+    запросе всё читается из основной БД. Миграции применяются только
+    к основной БД, реплики получают схему репликацией.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state is None or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.replica = None
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary():
+    """Читает из основной БД внутри блока."""
+    state = current_state.get()
+    if state is None or state.replica is None:
+        yield
+        return
+    replica, state.replica = state.replica, None
+    try:
+        yield
+    finally:
+        if not state.wrote:
+            state.replica = replica
+
+
+def is_settled(version):
+    """Версия данных старше допустимого отставания реплик.
+
+    Кэши с версиями (ответы, справочники, фрагменты) не сохраняют то,
+    что прочитано сразу после изменения: реплика могла его не получить.
+    """
+    return not settings.DATABASE_REPLICAS or (
+        time.time_ns() - version > settings.DATABASE_REPLICA_LAG * 10 ** 9)
+
+
+def check_connection(alias):
+    """Переоткрывает оборванное постоянное соединение и подключается."""
+    connection = connections[alias]
+    if connection.in_atomic_block:
+        return True
+    try:
+        if (connection.connection is not None
+                and settings.DATABASE_HEALTH_CHECKS
+                and not connection.is_usable()):
+            connection.close()
+        connection.ensure_connection()
+    except DatabaseError:
+        connection.close()
+        return False
+    return True
+
+
+def choose_replica():
+    now = time.monotonic()
+    replicas = [alias for alias in settings.DATABASE_REPLICAS
+                if unhealthy.get(alias, 0) <= now]
+    random.shuffle(replicas)
+    for alias in replicas:
+        if check_connection(alias):
+            unhealthy.pop(alias, None)
+            return alias
+        unhealthy[alias] = now + settings.DATABASE_REPLICA_RETRY
+    return None
+
+
+def get_pin_key(request):
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if credentials:
+        return f'db:primary:{hashlib.sha256(credentials.encode()).hexdigest()}'
+    return None
+
+
+class ReplicaMiddleware:
+    """Выбирает БД для чтения на время запроса.
+
+    GET, HEAD и OPTIONS читают из случайной здоровой реплики, остальные
+    методы — из основной БД. Клиент, который что-то записал, на
+    ``DATABASE_REPLICA_LAG`` секунд закрепляется за основной БД по
+    заголовку Authorization или сессии, чтобы видеть свои изменения.
+    Постоянные соединения основной БД проверяются в начале запроса.
+    В async-режиме выбор реплики и закрепление выполняются в пуле
+    потоков, где работают запросы представлений.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if connections[DEFAULT_DB_ALIAS].connection is not None:
+            check_connection(DEFAULT_DB_ALIAS)
+        state = DatabaseState(self.get_replica(request))
+        token = current_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        if self.should_pin(request, state):
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        replica = None
+        if settings.DATABASE_REPLICAS:
+            replica = await database_sync_to_async(self.get_replica)(request)
+        state = DatabaseState(replica)
+        token = current_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        if self.should_pin(request, state):
+            await database_sync_to_async(self.pin)(request)
+        return response
+
+    def get_replica(self, request):
+        if not settings.DATABASE_REPLICAS or request.method not in (
+                SAFE_METHODS):
+            return None
+        pin_key = get_pin_key(request)
+        if pin_key and cache.get(pin_key):
+            return None
+        return choose_replica()
+
+    def should_pin(self, request, state):
+        return bool(settings.DATABASE_REPLICAS) and (
+            state.wrote or request.method not in SAFE_METHODS)
+
+    def pin(self, request):
+        pin_key = get_pin_key(request)
+        if pin_key:
+            cache.set(pin_key, 1, settings.DATABASE_REPLICA_LAG)
@@ -0,0 +1,150 @@
+import hashlib
+import time
+
+from core.catalog_cache import LRUCache
+from core.replicas import is_settled
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+local_cache = LRUCache(settings.RESPONSE_CACHE_LRU_SIZE)
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def get_tag_key(tag):
+    return f'response:tag:{tag}:version'
+
+
+def get_tag_versions(tags, default=None):
+    keys = {get_tag_key(tag): tag for tag in tags}
+    versions = get_cache().get_many(keys)
+    missing = {key: default or time.time_ns()
+               for key in keys if key not in versions}
+    if missing:
+        get_cache().set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_response_tags(*tags):
+    get_cache().set_many({get_tag_key(tag): time.time_ns()
+                          for tag in tags}, None)
+
+
+def schedule_response_invalidation(*tags):
+    transaction.on_commit(lambda: invalidate_response_tags(*tags))
+
+
+class CachedResponseMixin:
+    """Кэш готовых JSON-ответов list/retrieve для анонимных GET.
+
+    Ключ строится по нормализованной строке запроса: учитываются только
+    параметры из ``response_cache_params``. Запись хранит версии своих
+    тегов (``get_response_tags``); сигналы моделей меняют версии, и запись
+    считается устаревшей. Устаревший ответ ещё ``RESPONSE_CACHE_STALE``
+    секунд отдаётся, пока другой запрос пересобирает его. Ответы помечаются
+    ``Cache-Control`` и ``ETag`` для кэша nginx и клиентов.
+    """
+
+    response_cache_params = ()
+    response_cache_bypass_params = ('format',)
+
+    def get_response_tags(self, data):
+        return set()
+
+    def is_response_cacheable(self, request):
+        return (
+            request.method == 'GET'
+            and not request.user.is_authenticated
+            and request.accepted_renderer.format == 'json'
+            and not any(param in request.query_params
+                        for param in self.response_cache_bypass_params)
+        )
+
+    def get_response_cache_key(self, request):
+        query = {
+            name: sorted(value for value in values if value)
+            for name, values in request.query_params.lists()
+            if name in self.response_cache_params
+        }
+        if self.paginator is not None and self.action == 'list':
+            query[self.paginator.page_size_query_param] = (
+                self.paginator.get_page_size(request))
+            page_query_param = getattr(
+                self.paginator, 'page_query_param', None)
+            if page_query_param:
+                query[page_query_param] = request.query_params.get(
+                    page_query_param) or '1'
+        variant = hashlib.md5(
+            f'{request.build_absolute_uri("/")}:{self.action}:'
+            f'{sorted(self.kwargs.items())}:{sorted(query.items())}'.encode()
+        ).hexdigest()
+        return f'response:{self.basename}:{variant}'
+
+    def get_cached_response(self, request, render):
+        if not self.is_response_cacheable(request):
+            return render()
+        key = self.get_response_cache_key(request)
+        lock_key = f'{key}:lock'
+        locked = False
+        entry = local_cache.get(key) or get_cache().get(key)
+        if entry is not None:
+            versions, content, etag = entry
+            current = get_tag_versions(versions)
+            if current == versions:
+                return self.build_cached_response(request, content, etag,
+                                                  'HIT')
+            stale_for = (time.time_ns() - max(current.values())) / 1e9
+            locked = get_cache().add(lock_key, 1,
+                                     settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+            if not locked and stale_for < settings.RESPONSE_CACHE_STALE:
+                return self.build_cached_response(request, content, etag,
+                                                  'STALE')
+        started = time.time_ns()
+        try:
+            response = render()
+        finally:
+            if locked:
+                get_cache().delete(lock_key)
+        if response.status_code != 200:
+            return response
+        content = JSONRenderer().render(response.data)
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        versions = get_tag_versions(self.get_response_tags(response.data),
+                                    started - 1)
+        if all(version < started and is_settled(version)
+               for version in versions.values()):
+            entry = (versions, content, etag)
+            get_cache().set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+            local_cache.set(key, entry)
+        return self.build_cached_response(request, content, etag, 'MISS')
+
+    def build_cached_response(self, request, content, etag, status):
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        response['X-Cache'] = status
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.RESPONSE_CACHE_MAX_AGE,
+            stale_while_revalidate=settings.RESPONSE_CACHE_STALE)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(CachedResponseMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(CachedResponseMixin, self).retrieve(
+                request, *args, **kwargs))
@@ -0,0 +1,132 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from core.autocomplete import normalize
+from core.catalog_cache import get_catalog_version
+from core.replicas import use_primary
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, F, IntegerField, OuterRef, Subquery, Value,
+                              When)
+from django.db.models.functions import Coalesce
+from recipes.models import Recipe, RecipeIngredient
+
+TOKEN_PATTERN = re.compile(r'\w+')
+FIELD_WEIGHTS = (('name', 'A', 1.0), ('text', 'B', 0.4),
+                 ('ingredients', 'C', 0.2))
+
+
+def tokenize(value):
+    return TOKEN_PATTERN.findall(normalize(value))
+
+
+def get_search_vector():
+    ingredient_names = RecipeIngredient.objects.filter(
+        recipe_id=OuterRef('pk')).order_by().values('recipe_id').annotate(
+        names=StringAgg('ingredient__name', ' ')).values('names')
+    sources = {
+        'name': F('name'),
+        'text': F('text'),
+        'ingredients': Coalesce(Subquery(ingredient_names), Value('')),
+    }
+    return reduce(lambda left, right: left + right, (
+        SearchVector(sources[field], config=config, weight=weight)
+        for config in settings.RECIPE_SEARCH_CONFIGS
+        for field, weight, _ in FIELD_WEIGHTS
+    ))
+
+
+def update_search_vectors(*recipe_ids):
+    recipes = Recipe.objects.filter(pk__in=recipe_ids)
+    if connections[recipes.db].vendor == 'postgresql':
+        recipes.update(search_vector=get_search_vector())
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов в памяти воркера.
+
+    Используется вместо tsvector, когда база не PostgreSQL. Термины
+    запроса ищутся по префиксу, все они должны встретиться в рецепте.
+    Индекс перестраивается при смене версии ``recipes`` в общем кэше.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.state = ([], [])
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = get_catalog_version('recipes')
+        if version == self.version:
+            return
+        with self.lock, use_primary():
+            if version == self.version:
+                return
+            weights = {field: weight for field, _, weight in FIELD_WEIGHTS}
+            postings = defaultdict(lambda: defaultdict(float))
+
+            def add(pk, field, value):
+                for token in tokenize(value):
+                    postings[token][pk] += weights[field]
+
+            for pk, name, text in Recipe.objects.values_list(
+                    'pk', 'name', 'text'):
+                add(pk, 'name', name)
+                add(pk, 'text', text)
+            for pk, name in RecipeIngredient.objects.values_list(
+                    'recipe_id', 'ingredient__name'):
+                add(pk, 'ingredients', name)
+            terms = sorted(postings)
+            self.state = (terms, [dict(postings[term]) for term in terms])
+            self.version = version
+
+    def search(self, query, limit):
+        self.refresh()
+        terms, postings = self.state
+        scores = None
+        for token in set(tokenize(query)):
+            matches = defaultdict(float)
+            position = bisect_left(terms, token)
+            while position < len(terms) and terms[position].startswith(
+                    token):
+                for pk, weight in postings[position].items():
+                    matches[pk] = max(matches[pk], weight)
+                position += 1
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pk: score + matches[pk]
+                          for pk, score in scores.items() if pk in matches}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [pk for pk, _ in ranked[:limit]]
+
+
+recipe_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, value):
+    if connections[queryset.db].vendor == 'postgresql':
+        query = reduce(or_, (
+            SearchQuery(value, config=config)
+            for config in settings.RECIPE_SEARCH_CONFIGS))
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    ids = recipe_index.search(value, settings.RECIPE_SEARCH_MAX_RESULTS)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(
+        Case(*[When(pk=pk, then=Value(position))
+               for position, pk in enumerate(ids)],
+             output_field=IntegerField()))
@@ -0,0 +1,136 @@
+import csv
+import io
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from recipes.models import RecipeIngredient, ShoppingCard
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+def get_version_key(user_id):
+    return f'shopping_cart:{user_id}:version'
+
+
+def get_recipe_version_key(recipe_id):
+    return f'shopping_cart:recipe:{recipe_id}:version'
+
+
+def get_cache_key(user_id):
+    version = cache.get_or_set(get_version_key(user_id), time.time_ns(), None)
+    return f'shopping_cart:{user_id}:{version}'
+
+
+def get_recipe_versions(recipe_ids):
+    keys = {get_recipe_version_key(recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_shopping_cart(*user_ids):
+    cache.set_many({get_version_key(user_id): time.time_ns()
+                    for user_id in user_ids}, None)
+
+
+def invalidate_recipe_shopping_carts(*recipe_ids):
+    cache.set_many({get_recipe_version_key(recipe_id): time.time_ns()
+                    for recipe_id in recipe_ids}, None)
+
+
+def iter_products(user):
+    """Строки списка покупок (название, единица, количество).
+
+    Агрегат читается из БД через серверный курсор и по мере отдачи
+    складывается в кэш пользователя вместе с версиями рецептов корзины.
+    Повторные выгрузки идут из кэша, пока не изменятся ShoppingCard
+    пользователя или RecipeIngredient его рецептов.
+    """
+    cache_key = get_cache_key(user.id)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        recipe_versions, products = cached
+        if get_recipe_versions(recipe_versions) == recipe_versions:
+            yield from products
+            return
+    recipe_versions = get_recipe_versions(
+        ShoppingCard.objects.filter(user=user).values_list(
+            'recipe_id', flat=True))
+    products = []
+    queryset = RecipeIngredient.objects.filter(
+        recipe__shopping_card__user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit').annotate(
+        total_amount=Sum('amount')).order_by(
+        'ingredient__name', 'ingredient__measurement_unit')
+    for product in queryset.iterator(
+            chunk_size=settings.SHOPPING_CART_CHUNK_SIZE):
+        products.append(product)
+        yield product
+    cache.set(cache_key, (recipe_versions, products),
+              settings.SHOPPING_CART_CACHE_TIMEOUT)
+
+
+def render_txt(products):
+    for name, unit, amount in products:
+        yield f'{name} {amount} {unit}\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(products):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for name, unit, amount in products:
+        yield writer.writerow((name, amount, unit))
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if not os.path.exists(settings.SHOPPING_CART_PDF_FONT):
+        return 'Helvetica'
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT))
+    return PDF_FONT_NAME
+
+
+def render_pdf(products):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    font = get_pdf_font()
+    width, height = A4
+    position = height - PDF_MARGIN
+    pdf.setFont(font, PDF_FONT_SIZE)
+    for name, unit, amount in products:
+        if position < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            position = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, position, f'{name} {amount} {unit}')
+        position -= PDF_LINE_HEIGHT
+    pdf.save()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
@@ -0,0 +1,181 @@
+import contextvars
+from contextlib import contextmanager
+
+from core.authentication import invalidate_tokens
+from core.catalog_cache import invalidate_catalog
+from core.counters import change_counter
+from core.images import schedule_renditions
+from core.response_cache import (invalidate_response_tags,
+                                 schedule_response_invalidation)
+from core.search import update_search_vectors
+from core.shopping_cart import (invalidate_recipe_shopping_carts,
+                                invalidate_shopping_cart)
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, RecipeScore, ShoppingCard, Tag)
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+saving_recipe = contextvars.ContextVar('saving_recipe', default=False)
+
+
+def get_recipe_response_tags(*recipe_ids):
+    return ('recipes', *(f'recipe:{pk}' for pk in recipe_ids))
+
+
+def on_recipes_commit(*recipe_ids):
+    invalidate_catalog('recipes')
+    invalidate_response_tags(*get_recipe_response_tags(*recipe_ids))
+    update_search_vectors(*recipe_ids)
+
+
+def schedule_search_update(*recipe_ids):
+    transaction.on_commit(lambda: on_recipes_commit(*recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=ShoppingCard)
+def invalidate_owner_shopping_cart(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_shopping_cart(user_id))
+
+
+@contextmanager
+def recipe_save():
+    """Правка рецепта вместе с составом одним сохранением.
+
+    Построчный обработчик RecipeIngredient внутри блока пропускается:
+    ``updated`` и пересчёт поиска один раз за правку даёт сохранение
+    самого рецепта, списки покупок сбрасывает тот, кто меняет состав.
+    """
+    token = saving_recipe.set(True)
+    try:
+        yield
+    finally:
+        saving_recipe.reset(token)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    if saving_recipe.get():
+        return
+    invalidate_recipe_shopping_carts(instance.recipe_id)
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated=timezone.now())
+    schedule_search_update(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, **kwargs):
+    schedule_search_update(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_search(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_catalog('recipes'))
+    schedule_response_invalidation(*get_recipe_response_tags(instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        schedule_response_invalidation(
+            *get_recipe_response_tags(instance.pk))
+    elif pk_set:
+        schedule_response_invalidation(*get_recipe_response_tags(*pk_set))
+    else:
+        schedule_response_invalidation('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags_catalog(sender, **kwargs):
+    invalidate_catalog('tags')
+    schedule_response_invalidation('tags')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients_catalog(sender, **kwargs):
+    invalidate_catalog('ingredients')
+    schedule_response_invalidation('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(RecipeIngredient.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+        schedule_search_update(*recipe_ids)
+        transaction.on_commit(
+            lambda: invalidate_recipe_shopping_carts(*recipe_ids))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens(key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    schedule_response_invalidation(f'user:{instance.pk}')
+    keys = list(Token.objects.filter(
+        user_id=instance.pk).values_list('key', flat=True))
+    transaction.on_commit(lambda: invalidate_tokens(*keys))
+
+
+@receiver(post_save, sender=Recipe)
+def prepare_image_renditions(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        tags = get_recipe_response_tags(instance.pk)
+        transaction.on_commit(lambda: schedule_renditions(
+            name, lambda: invalidate_response_tags(*tags)))
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+def get_counter_delta(signal, created=False):
+    if signal is post_delete:
+        return -1
+    return 1 if created else 0
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def count_favorites(sender, instance, signal, created=False, **kwargs):
+    delta = get_counter_delta(signal, created)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', delta)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCard)
+def count_shopping_carts(sender, instance, signal, created=False, **kwargs):
+    delta = get_counter_delta(signal, created)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', delta)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def count_recipes(sender, instance, signal, created=False, **kwargs):
+    delta = get_counter_delta(signal, created)
+    if delta:
+        change_counter(User, instance.author_id, 'recipes_count', delta)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def count_followers(sender, instance, signal, created=False, **kwargs):
+    delta = get_counter_delta(signal, created)
+    if delta:
+        change_counter(User, instance.author_id, 'followers_count', delta)
@@ -0,0 +1,285 @@
+import heapq
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from recipes.models import Recipe, RecipeIngredient, TagRecipe
+
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_HASH = np.uint64(MERSENNE_PRIME)
+INDEX_FILE = 'index.npy'
+SIGNATURES_FILE = 'signatures.npy'
+META_FILE = 'meta.json'
+
+
+def get_index_dtype(neighbors):
+    return np.dtype([
+        ('recipe_id', '<i8'),
+        ('neighbors', '<i8', (neighbors,)),
+        ('scores', '<f4', (neighbors,)),
+    ])
+
+
+def load_features(recipe_ids=None):
+    """Множества признаков рецептов: ингредиенты чётные, теги нечётные."""
+    features = defaultdict(set)
+    sources = (
+        (RecipeIngredient.objects.all(), 'ingredient_id', 0),
+        (TagRecipe.objects.all(), 'tag_id', 1),
+    )
+    for rows, field, parity in sources:
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        for recipe_id, pk in rows.values_list('recipe_id', field).iterator():
+            features[recipe_id].add(pk * 2 + parity)
+    return features
+
+
+def jaccard(left, right):
+    if not left or not right:
+        return 0.0
+    common = len(left & right)
+    return common / (len(left) + len(right) - common)
+
+
+def get_hash_params(num_perm):
+    rng = np.random.default_rng(settings.SIMILAR_RECIPES_SEED)
+    return (rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64),
+            rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64))
+
+
+def minhash(feature_sets, num_perm):
+    """MinHash-сигнатуры (len(feature_sets), num_perm) для множеств."""
+    multipliers, offsets = get_hash_params(num_perm)
+    signatures = np.full((len(feature_sets), num_perm), MAX_HASH,
+                         dtype=np.uint64)
+    for row, features in enumerate(feature_sets):
+        if features:
+            values = np.fromiter(features, dtype=np.uint64)[:, None]
+            signatures[row] = (
+                (values * multipliers + offsets) % MAX_HASH).min(axis=0)
+    return signatures.astype(np.uint32)
+
+
+def get_band_keys(signatures, bands):
+    rows = signatures.shape[1] // bands
+    return [
+        [signature[band * rows:(band + 1) * rows].tobytes()
+         for band in range(bands)]
+        for signature in signatures
+    ]
+
+
+class SimilarRecipesBuilder:
+    """Строит и обновляет индекс похожих рецептов на диске.
+
+    Кандидаты ищутся через LSH по MinHash-сигнатурам ингредиентов и
+    тегов, для кандидатов считается точный коэффициент Жаккара. Файл
+    индекса заменяется атомарно, воркеры подхватывают его по mtime.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.SIMILAR_RECIPES_DIR)
+        self.num_perm = settings.SIMILAR_RECIPES_NUM_PERM
+        self.bands = settings.SIMILAR_RECIPES_BANDS
+        self.neighbors = settings.SIMILAR_RECIPES_NEIGHBORS
+        self.max_bucket = settings.SIMILAR_RECIPES_MAX_BUCKET
+
+    def get_buckets(self, band_keys):
+        buckets = defaultdict(list)
+        for row, keys in enumerate(band_keys):
+            for band, key in enumerate(keys):
+                buckets[band, key].append(row)
+        return buckets
+
+    def get_candidates(self, row, band_keys, buckets):
+        candidates = set()
+        for band, key in enumerate(band_keys[row]):
+            bucket = buckets[band, key]
+            if len(bucket) <= self.max_bucket:
+                candidates.update(bucket)
+        return candidates
+
+    def rank(self, recipe_id, features, candidate_features):
+        scored = (
+            (jaccard(features, other), other_id)
+            for other_id, other in candidate_features.items()
+            if other_id != recipe_id
+        )
+        return heapq.nlargest(
+            self.neighbors, (item for item in scored if item[0] > 0))
+
+    def build(self):
+        started = timezone.now()
+        features = load_features()
+        recipe_ids = sorted(Recipe.objects.values_list('pk', flat=True))
+        feature_sets = [features.get(pk, set()) for pk in recipe_ids]
+        signatures = minhash(feature_sets, self.num_perm)
+        band_keys = get_band_keys(signatures, self.bands)
+        buckets = self.get_buckets(band_keys)
+        index = np.zeros(len(recipe_ids), dtype=get_index_dtype(
+            self.neighbors))
+        index['recipe_id'] = recipe_ids
+        index['neighbors'] = -1
+        for row, recipe_id in enumerate(recipe_ids):
+            candidates = self.get_candidates(row, band_keys, buckets)
+            ranked = self.rank(recipe_id, feature_sets[row], {
+                recipe_ids[other]: feature_sets[other]
+                for other in candidates})
+            self.fill_row(index[row], ranked)
+        self.save(index, signatures, started)
+        return len(recipe_ids)
+
+    def update(self):
+        """Пересчитывает рецепты, изменённые после прошлой сборки.
+
+        Соседи пересчитываются и у рецептов, в списках которых были
+        изменённые или удалённые рецепты, чтобы в них не осталось
+        устаревших id.
+
+        Возвращает число пересчитанных рецептов или None, если индекса
+        ещё нет и нужна полная сборка.
+        """
+        try:
+            meta = json.loads((self.directory / META_FILE).read_text())
+            index = np.load(self.directory / INDEX_FILE)
+            signatures = np.load(self.directory / SIGNATURES_FILE)
+        except (FileNotFoundError, ValueError):
+            return None
+        if (meta['num_perm'] != self.num_perm
+                or meta['bands'] != self.bands
+                or index['neighbors'].shape[1] != self.neighbors):
+            return None
+        started = timezone.now()
+        since = datetime.fromisoformat(meta['built_at']) - timedelta(
+            seconds=settings.SIMILAR_RECIPES_OVERLAP)
+        alive = set(Recipe.objects.values_list('pk', flat=True))
+        changed = sorted(Recipe.objects.filter(
+            updated__gte=since).values_list('pk', flat=True))
+        keep = np.isin(index['recipe_id'], list(alive))
+        stale = index['recipe_id'][~keep].tolist() + changed
+        index, signatures = index[keep], signatures[keep]
+        affected = index['recipe_id'][np.isin(
+            index['neighbors'], stale).any(axis=1)].tolist()
+        known = set(index['recipe_id'].tolist())
+        added = [pk for pk in changed if pk not in known]
+        if added:
+            extra = np.zeros(len(added), dtype=index.dtype)
+            extra['recipe_id'] = added
+            extra['neighbors'] = -1
+            index = np.concatenate((index, extra))
+            signatures = np.concatenate((signatures, np.zeros(
+                (len(added), self.num_perm), dtype=np.uint32)))
+            order = np.argsort(index['recipe_id'], kind='stable')
+            index, signatures = index[order], signatures[order]
+        recipe_ids = index['recipe_id'].tolist()
+        rows = {pk: row for row, pk in enumerate(recipe_ids)}
+        changed_features = load_features(changed)
+        changed_rows = [rows[pk] for pk in changed]
+        signatures[changed_rows] = minhash(
+            [changed_features.get(pk, set()) for pk in changed],
+            self.num_perm)
+        band_keys = get_band_keys(signatures, self.bands)
+        buckets = self.get_buckets(band_keys)
+        changed_ids = set(changed)
+        refreshed = sorted(changed_ids | set(affected))
+        candidates = {
+            pk: self.get_candidates(rows[pk], band_keys, buckets)
+            for pk in refreshed
+        }
+        candidate_ids = {recipe_ids[row] for found in candidates.values()
+                         for row in found}
+        features = load_features(candidate_ids | set(refreshed))
+        for pk in refreshed:
+            ranked = self.rank(pk, features.get(pk, set()), {
+                recipe_ids[row]: features.get(recipe_ids[row], set())
+                for row in candidates[pk]})
+            self.fill_row(index[rows[pk]], ranked)
+            if pk in changed_ids:
+                for score, other_id in ranked:
+                    self.insert_neighbor(index[rows[other_id]], pk, score)
+        self.save(index, signatures, started)
+        return len(refreshed)
+
+    def fill_row(self, row, ranked):
+        row['neighbors'] = -1
+        row['scores'] = 0
+        for position, (score, other_id) in enumerate(ranked):
+            row['neighbors'][position] = other_id
+            row['scores'][position] = score
+
+    def insert_neighbor(self, row, recipe_id, score):
+        ranked = [
+            (float(other_score), int(other_id))
+            for other_id, other_score in zip(row['neighbors'], row['scores'])
+            if other_id != -1 and other_id != recipe_id
+        ]
+        ranked.append((score, recipe_id))
+        self.fill_row(row, heapq.nlargest(self.neighbors, ranked))
+
+    def save(self, index, signatures, built_at):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, data in ((SIGNATURES_FILE, signatures),
+                           (INDEX_FILE, index)):
+            temporary = self.directory / f'.{name}.tmp'
+            with open(temporary, 'wb') as file:
+                np.save(file, data)
+            os.replace(temporary, self.directory / name)
+        (self.directory / META_FILE).write_text(json.dumps({
+            'built_at': built_at.isoformat(),
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+        }))
+
+
+class SimilarRecipesIndex:
+    """Индекс похожих рецептов, отображённый в память воркера."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.mtime = None
+        self.index = None
+        self.lock = threading.Lock()
+
+    def get_path(self):
+        return Path(self.directory or settings.SIMILAR_RECIPES_DIR) / (
+            INDEX_FILE)
+
+    def refresh(self):
+        path = self.get_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self.index = None
+            return
+        if mtime == self.mtime:
+            return
+        with self.lock:
+            if mtime != self.mtime:
+                self.index = np.load(path, mmap_mode='r')
+                self.mtime = mtime
+
+    def get(self, recipe_id, limit):
+        """Список (id рецепта, сходство) по убыванию сходства."""
+        self.refresh()
+        index = self.index
+        if index is None or not len(index):
+            return []
+        row = int(np.searchsorted(index['recipe_id'], recipe_id))
+        if row == len(index) or index['recipe_id'][row] != recipe_id:
+            return []
+        return [
+            (int(pk), float(score))
+            for pk, score in zip(index['neighbors'][row][:limit],
+                                 index['scores'][row][:limit])
+            if pk != -1
+        ]
+
+
+similar_index = SimilarRecipesIndex()
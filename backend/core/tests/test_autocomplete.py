@@ -0,0 +1,35 @@
+from api.tests.base import TEST_CACHES
+from core.autocomplete import IngredientIndex
+from django.test import TestCase
+from django.test.utils import override_settings
+from recipes.models import Ingredient
+
+
+@override_settings(CACHES=TEST_CACHES)
+class IngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = {
+            name: Ingredient.objects.create(
+                name=name, measurement_unit='г').pk
+            for name in ('банан', 'бадьян', 'кабачок', 'Ёжевика',
+                         'бабаганош', 'рыба')
+        }
+
+    def search(self, query, limit=10):
+        names = {pk: name for name, pk in self.ids.items()}
+        return [names[pk] for pk in IngredientIndex().search(query, limit)]
+
+    def test_prefix_matches_by_length(self):
+        self.assertEqual(self.search('ба', limit=3),
+                         ['банан', 'бадьян', 'бабаганош'])
+
+    def test_substring_matches_by_position(self):
+        self.assertEqual(self.search('аб'), ['кабачок', 'бабаганош'])
+
+    def test_prefix_match_is_not_repeated_as_substring(self):
+        self.assertEqual(self.search('ба'),
+                         ['банан', 'бадьян', 'бабаганош', 'рыба', 'кабачок'])
+
+    def test_query_is_normalized(self):
+        self.assertEqual(self.search(' ЕЖ'), ['Ёжевика'])
@@ -0,0 +1,75 @@
+import io
+
+from api.tests.base import FoodgramAPITestCase
+from django.core.management import call_command
+from recipes.models import Favorite, Recipe, ShoppingCard
+from users.models import User
+
+
+class CountersTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.author = cls.create_user('author')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes([cls.author], 3, tags, ingredients)
+
+    def setUp(self):
+        super().setUp()
+        self.user_client = self.get_client(self.user)
+
+    def get_counts(self, field):
+        return list(Recipe.objects.order_by('pk').values_list(
+            field, flat=True))
+
+    def test_recipe_counters_follow_relations(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        for endpoint, field in (('favorite', 'favorites_count'),
+                                ('shopping_cart', 'in_carts_count')):
+            with self.subTest(endpoint=endpoint):
+                self.user_client.post(f'/api/recipes/{first}/{endpoint}/')
+                self.user_client.post(f'/api/recipes/{endpoint}/',
+                                      {'ids': [first, second]},
+                                      format='json')
+                self.get_client(self.author).post(
+                    f'/api/recipes/{second}/{endpoint}/')
+                self.assertEqual(self.get_counts(field), [1, 2, 0])
+                self.user_client.delete(f'/api/recipes/{endpoint}/',
+                                        {'ids': [second, third]},
+                                        format='json')
+                self.user_client.delete(f'/api/recipes/{third}/{endpoint}/')
+                self.assertEqual(self.get_counts(field), [1, 1, 0])
+
+    def test_user_counters_follow_recipes_and_followers(self):
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(author.recipes_count, 3)
+        self.user_client.post(f'/api/users/{author.pk}/subscribe/')
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 1)
+        self.recipes[0].delete()
+        self.user_client.delete(f'/api/users/{author.pk}/subscribe/')
+        author.refresh_from_db()
+        self.assertEqual(
+            (author.recipes_count, author.followers_count), (2, 0))
+
+    def test_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        recipe.name = 'Новое название'
+        recipe.save()
+        self.assertEqual(self.get_counts('favorites_count')[0], 1)
+
+    def test_recount(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        ShoppingCard.objects.create(user=self.user, recipe=self.recipes[1])
+        Recipe.objects.update(favorites_count=7, in_carts_count=7)
+        User.objects.update(recipes_count=7, followers_count=7)
+        stdout = io.StringIO()
+        call_command('recount', stdout=stdout)
+        self.assertIn('рецептов 3, пользователей 2', stdout.getvalue())
+        self.assertEqual(self.get_counts('favorites_count'), [1, 0, 0])
+        self.assertEqual(self.get_counts('in_carts_count'), [0, 1, 0])
+        self.assertEqual(
+            dict(User.objects.values_list('username', 'recipes_count')),
+            {'reader': 0, 'author': 3})
+        self.assertFalse(User.objects.exclude(followers_count=0).exists())
@@ -0,0 +1,59 @@
+import io
+import tempfile
+from pathlib import Path
+
+from api.tests.base import TEST_CACHES
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from recipes.models import Ingredient
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LoadIngredientsTest(TestCase):
+    def setUp(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        Ingredient.objects.create(name='молоко', measurement_unit='мл')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'ingredients.csv'
+        self.path.write_text(
+            'соль,щепотка\nмолоко,мл\nсахар,г\n', encoding='utf-8')
+
+    def load(self, *args):
+        stdout = io.StringIO()
+        call_command('load_ingredients', '--path', str(self.path),
+                     '--batch-size', '2', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def get_ingredients(self):
+        return set(Ingredient.objects.values_list(
+            'name', 'measurement_unit'))
+
+    def test_insert_keeps_existing_rows(self):
+        output = self.load()
+        self.assertEqual(self.get_ingredients(), {
+            ('соль', 'г'), ('соль', 'щепотка'), ('молоко', 'мл'),
+            ('сахар', 'г')})
+        self.assertIn('добавлено 2, обновлено 0, пропущено 1', output)
+
+    def test_upsert_updates_measurement_unit(self):
+        salt = Ingredient.objects.get(name='соль')
+        output = self.load('--upsert')
+        self.assertEqual(self.get_ingredients(), {
+            ('соль', 'щепотка'), ('молоко', 'мл'), ('сахар', 'г')})
+        self.assertEqual(
+            Ingredient.objects.get(name='соль').pk, salt.pk)
+        self.assertIn('добавлено 1, обновлено 1, пропущено 1', output)
+        self.assertIn('добавлено 0, обновлено 0, пропущено 3',
+                      self.load('--upsert'))
+
+    def test_upsert_keeps_every_unit_of_a_name(self):
+        self.path.write_text(
+            'перец,г\nперец,шт.\nсоль,г\nсоль,кг\nперец,кг\n',
+            encoding='utf-8')
+        output = self.load('--upsert')
+        self.assertEqual(self.get_ingredients(), {
+            ('перец', 'г'), ('перец', 'шт.'), ('перец', 'кг'),
+            ('соль', 'г'), ('соль', 'кг'), ('молоко', 'мл')})
+        self.assertIn('добавлено 4, обновлено 0, пропущено 1', output)
@@ -0,0 +1,91 @@
+import numpy as np
+from api.tests.base import FoodgramAPITestCase
+from core.catalog_cache import invalidate_catalog
+from core.pantry import PantryIndex, popcount
+from django.test import SimpleTestCase
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+class PopcountTest(SimpleTestCase):
+    def test_popcount(self):
+        values = [0, 1, 3, 2 ** 63, 2 ** 64 - 1, 0x0123456789abcdef]
+        self.assertEqual(
+            popcount(np.array(values, dtype=np.uint64)).tolist(),
+            [bin(value).count('1') for value in values])
+
+
+class PantryIndexTest(FoodgramAPITestCase):
+    """Подбор рецептов по продуктам, в том числе за пределами 64 бит."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Продукт {index}',
+                                      measurement_unit='г')
+            for index in range(70)]
+        cls.recipes = {}
+        for name, indexes in (('eggs', (0, 1)), ('omelette', (0, 1, 2)),
+                              ('cake', (0, 1, 68, 69)), ('soup', (5, 6)),
+                              ('salad', (68,))):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=5,
+                image='recipes/test.png')
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, amount=1,
+                                 ingredient=cls.ingredients[index])
+                for index in indexes)
+            cls.recipes[name] = recipe.pk
+
+    def setUp(self):
+        super().setUp()
+        self.index = PantryIndex()
+
+    def search(self, indexes, limit=10):
+        names = {pk: name for name, pk in self.recipes.items()}
+        return [(names[pk], missing) for pk, missing in self.index.search(
+            [self.ingredients[index].pk for index in indexes], limit)]
+
+    def test_orders_by_missing_then_matched_then_newest(self):
+        self.assertEqual(self.search((0, 1, 68)), [
+            ('eggs', 0), ('salad', 0), ('cake', 1), ('omelette', 1)])
+        self.assertEqual(self.search((0, 1, 68), limit=2),
+                         [('eggs', 0), ('salad', 0)])
+
+    def test_recipes_without_matches_are_skipped(self):
+        self.assertEqual(self.search((69,)), [('cake', 3)])
+        self.assertEqual(self.search(()), [])
+        self.assertEqual(self.index.search([10 ** 6], 10), [])
+
+    def test_changed_recipes_are_applied(self):
+        self.search((0,))
+        RecipeIngredient.objects.filter(
+            recipe_id=self.recipes['omelette'],
+            ingredient=self.ingredients[2]).delete()
+        Recipe.objects.create(
+            author_id=Recipe.objects.get(pk=self.recipes['eggs']).author_id,
+            name='toast', text='Описание', cooking_time=5,
+            image='recipes/test.png')
+        invalidate_catalog('recipes')
+        self.assertEqual(self.search((0, 1)), [
+            ('omelette', 0), ('eggs', 0), ('cake', 2)])
+        Recipe.objects.filter(pk=self.recipes['eggs']).delete()
+        invalidate_catalog('recipes')
+        self.assertEqual(self.search((0, 1)),
+                         [('omelette', 0), ('cake', 2)])
+
+    def test_what_can_i_cook(self):
+        ids = ','.join(str(self.ingredients[index].pk)
+                       for index in (0, 1, 68))
+        response = self.client.get('/api/recipes/what_can_i_cook/',
+                                   {'ingredients': ids, 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(recipe['name'], recipe['missing_ingredients_count'])
+             for recipe in response.json()],
+            [('eggs', 0), ('salad', 0), ('cake', 1)])
+        for params in ({}, {'ingredients': 'abc'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(
+                    '/api/recipes/what_can_i_cook/', params).status_code,
+                    400)
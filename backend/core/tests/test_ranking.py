@@ -0,0 +1,84 @@
+import math
+from datetime import timedelta
+
+from api.tests.base import FoodgramAPITestCase
+from core.ranking import get_decay_rate, get_trending, refresh_scores
+from django.utils import timezone
+from recipes.models import Favorite, RecipeScore, ShoppingCard
+
+
+class TrendingTest(FoodgramAPITestCase):
+    def test_get_trending(self):
+        rate = get_decay_rate()
+        self.assertEqual(get_trending([], rate), 0.0)
+        self.assertAlmostEqual(get_trending([(2.0, 100.0)], rate),
+                               math.log(2.0) + rate * 100)
+        self.assertAlmostEqual(
+            get_trending([(1.0, 100.0), (1.0, 100.0)], rate),
+            get_trending([(2.0, 100.0)], rate))
+
+    def test_get_trending_does_not_overflow(self):
+        moment = timezone.now().timestamp() * 10 ** 6
+        self.assertTrue(math.isfinite(get_trending(
+            [(1.0, moment), (2.0, moment - 1)], get_decay_rate())))
+
+
+class RecipeScoresTest(FoodgramAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [cls.create_user(f'user{index}') for index in range(3)]
+        author = cls.create_user('author')
+        tags, ingredients = cls.create_catalog()
+        cls.recipes = cls.create_recipes([author], 3, tags, ingredients)
+
+    def get_order(self, ordering):
+        response = self.client.get('/api/recipes/', {'ordering': ordering})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_refresh_only_stale_scores(self):
+        self.assertEqual(refresh_scores(), 3)
+        self.assertEqual(refresh_scores(), 0)
+        first, second, _ = self.recipes
+        Favorite.objects.create(user=self.users[0], recipe=first)
+        ShoppingCard.objects.create(user=self.users[0], recipe=second)
+        self.assertEqual(refresh_scores(), 2)
+        self.assertEqual(refresh_scores(), 0)
+        self.assertEqual(refresh_scores(full=True), 3)
+        self.assertEqual(
+            dict(RecipeScore.objects.values_list('recipe_id', 'popular')),
+            {first.pk: 1.0, second.pk: 2.0, self.recipes[2].pk: 0.0})
+
+    def test_popular_ordering(self):
+        first, second, third = self.recipes
+        for user in self.users:
+            Favorite.objects.create(user=user, recipe=first)
+        ShoppingCard.objects.create(user=self.users[0], recipe=third)
+        refresh_scores()
+        self.assertEqual(self.get_order('popular'),
+                         [first.pk, third.pk, second.pk])
+
+    def test_trending_prefers_recent_events(self):
+        first, second, third = self.recipes
+        for user in self.users[:2]:
+            Favorite.objects.create(user=user, recipe=first)
+        Favorite.objects.create(user=self.users[0], recipe=second)
+        Favorite.objects.filter(recipe=first).update(
+            created=timezone.now() - timedelta(days=10))
+        refresh_scores()
+        self.assertEqual(self.get_order('popular'),
+                         [first.pk, second.pk, third.pk])
+        self.assertEqual(self.get_order('trending'),
+                         [second.pk, first.pk, third.pk])
+
+    def test_refresh_invalidates_cached_ordering(self):
+        first, second, third = self.recipes
+        refresh_scores()
+        self.assertEqual(self.get_order('popular'),
+                         [third.pk, second.pk, first.pk])
+        Favorite.objects.create(user=self.users[0], recipe=first)
+        self.assertEqual(self.get_order('popular'),
+                         [third.pk, second.pk, first.pk])
+        refresh_scores()
+        self.assertEqual(self.get_order('popular'),
+                         [first.pk, third.pk, second.pk])
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from api.tests.base import TEST_CACHES
+from core import replicas
+from core.replicas import DatabaseState, ReplicaMiddleware, use_primary
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from recipes.models import Recipe
+
+REPLICA = 'replica_0'
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        replicas.unhealthy.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(replicas, 'check_connection',
+                                    return_value=True)
+        self.check_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_request(self, method='get', token='first', view=None):
+        self.reads = []
+
+        def get_response(request):
+            self.reads.append(router.db_for_read(Recipe))
+            if view is not None:
+                view()
+                self.reads.append(router.db_for_read(Recipe))
+            return HttpResponse()
+
+        request = getattr(self.factory, method)(
+            '/api/recipes/', HTTP_AUTHORIZATION=f'Token {token}')
+        ReplicaMiddleware(get_response)(request)
+        return self.reads
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.run_request(), [REPLICA])
+        self.assertEqual(self.run_request('post'), [DEFAULT_DB_ALIAS])
+
+    def test_write_pins_client_to_primary(self):
+        self.run_request('post')
+        self.assertEqual(self.run_request(), [DEFAULT_DB_ALIAS])
+        self.assertEqual(self.run_request(token='second'), [REPLICA])
+        cache.clear()
+        self.assertEqual(self.run_request(), [REPLICA])
+
+    def test_write_inside_get_switches_to_primary_and_pins(self):
+        self.assertEqual(
+            self.run_request(view=lambda: router.db_for_write(Recipe)),
+            [REPLICA, DEFAULT_DB_ALIAS])
+        self.assertEqual(self.run_request(), [DEFAULT_DB_ALIAS])
+
+    def test_use_primary(self):
+        reads = []
+
+        def view():
+            with use_primary():
+                reads.append(router.db_for_read(Recipe))
+
+        self.assertEqual(self.run_request(view=view), [REPLICA, REPLICA])
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+        self.assertEqual(self.run_request(token='second'), [REPLICA])
+
+    def test_write_inside_use_primary_keeps_primary(self):
+        state = DatabaseState(REPLICA)
+        token = replicas.current_state.set(state)
+        self.addCleanup(replicas.current_state.reset, token)
+        with use_primary():
+            router.db_for_write(Recipe)
+        self.assertEqual(router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+
+    def test_unhealthy_replica_is_skipped(self):
+        self.check_connection.return_value = False
+        self.assertEqual(self.run_request(), [DEFAULT_DB_ALIAS])
+        self.check_connection.return_value = True
+        self.assertEqual(self.run_request(), [DEFAULT_DB_ALIAS])
+        self.assertEqual(
+            self.check_connection.call_args_list.count(mock.call(REPLICA)),
+            1)
+        replicas.unhealthy.clear()
+        self.assertEqual(self.run_request(), [REPLICA])
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
@@ -1,8 +1,4 @@
-import base64
-
-from django.core.files.base import ContentFile
-from django.db.models import Sum
-from recipes.models import RecipeIngredient
+from core.images import decode_base64_image, get_rendition_url
 from rest_framework import mixins, serializers, viewsets
 
 
@@ -12,20 +8,31 @@ class ListRetrieveModelMixin(mixins.ListModelMixin, mixins.RetrieveModelMixin,
 
 
 class Base64ImageField(serializers.ImageField):
+    def __init__(self, *args, size=None, **kwargs):
+        self.size = size
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(data)
         return super().to_internal_value(data)
 
+    def to_representation(self, value):
+        size = self.context.get('image_size', self.size)
+        if not value or size is None:
+            return super().to_representation(value)
+        url = get_rendition_url(value.name, size)
+        if url is None:
+            return super().to_representation(value)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
 
-def get_product_list(user):
-    product_lst = RecipeIngredient.objects.filter(
-        recipe__shopping_card__user=user).select_related('shopping_card',
-                                                         'user').values_list(
-        'ingredient__name', 'ingredient__measurement_unit').annotate(
-        total_amount=Sum('amount'))
-    product_list = [f'{name} {amount} {unit}\n'
-                    for name, unit, amount in product_lst]
-    return ''.join(product_list)
+def get_positive_int(query_params, name):
+    try:
+        value = int(query_params[name])
+    except (KeyError, ValueError):
+        return None
+    return value if value > 0 else None
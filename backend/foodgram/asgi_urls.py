@@ -0,0 +1,9 @@
+from api.async_views import get_async_urlpatterns
+from api.urls import router_v1
+from django.urls import include, path
+from foodgram.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include(get_async_urlpatterns(router_v1.urls))),
+    *sync_urlpatterns,
+]
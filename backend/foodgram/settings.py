@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +45,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('DJANGO_ROOT_URLCONF', default='foodgram.urls')
 
 TEMPLATES = [
     {
@@ -74,9 +76,34 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", default=" "),
         "HOST": os.getenv("DB_HOST", default="127.0.0.1"),
         "PORT": os.getenv("DB_PORT", default="5432"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", default="60")),
+        "DISABLE_SERVER_SIDE_CURSORS": os.getenv(
+            "DB_DISABLE_SERVER_SIDE_CURSORS", default="False"
+        ).lower() == "true",
     }
 }
 
+# Реплики через запятую: host[:port] для PostgreSQL, путь к файлу для SQLite.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.getenv("DB_REPLICAS", default="").split(","))):
+    alias = f"replica_{index}"
+    DATABASES[alias] = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+    if DATABASES[alias]["ENGINE"].endswith("sqlite3"):
+        DATABASES[alias]["NAME"] = replica
+    else:
+        host, _, port = replica.partition(":")
+        DATABASES[alias]["HOST"] = host
+        DATABASES[alias]["PORT"] = port or DATABASES["default"]["PORT"]
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+DATABASE_REPLICA_LAG = int(os.getenv("DB_REPLICA_LAG", default="5"))
+DATABASE_REPLICA_RETRY = 30
+DATABASE_HEALTH_CHECKS = os.getenv(
+    "DB_HEALTH_CHECKS", default="True"
+).lower() == "true"
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,12 +139,100 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', default='/tmp/foodgram_cache'
+        ),
+    }
+}
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+CATALOG_CACHE_LRU_SIZE = 256
+
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_LRU_SIZE = 512
+RESPONSE_CACHE_MAX_AGE = 10
+RESPONSE_CACHE_STALE = 30
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+INGREDIENT_SEARCH_BACKEND = os.getenv(
+    'INGREDIENT_SEARCH_BACKEND', default='memory'
+)
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SEARCH_MAX_LIMIT = 100
+
+
+IMAGE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'webp': None,
+}
+IMAGE_RENDITIONS_QUALITY = 80
+IMAGE_RENDITIONS_WORKERS = 2
+IMAGE_RENDITIONS_SYNC = (
+    os.getenv('IMAGE_RENDITIONS_SYNC', default='False').lower() == 'true'
+)
+RECIPE_LIST_IMAGE_SIZE = 'card'
+
+RECIPE_SCORE_FAVORITE_WEIGHT = 1.0
+RECIPE_SCORE_CART_WEIGHT = 2.0
+RECIPE_TRENDING_HALF_LIFE_HOURS = 48
+RECIPE_SEARCH_CONFIGS = ('russian', 'english')
+RECIPE_SEARCH_MAX_RESULTS = 1000
+PANTRY_SEARCH_LIMIT = 20
+PANTRY_SEARCH_MAX_LIMIT = 100
+PANTRY_SYNC_OVERLAP = 60 * 5
+SIMILAR_RECIPES_DIR = os.getenv(
+    'SIMILAR_RECIPES_DIR',
+    default=os.path.join(BASE_DIR, 'indexes', 'similar_recipes')
+)
+SIMILAR_RECIPES_NEIGHBORS = 20
+SIMILAR_RECIPES_LIMIT = 8
+SIMILAR_RECIPES_NUM_PERM = 64
+SIMILAR_RECIPES_BANDS = 32
+SIMILAR_RECIPES_MAX_BUCKET = 1000
+SIMILAR_RECIPES_SEED = 42
+SIMILAR_RECIPES_OVERLAP = 60 * 5
+BULK_MAX_IDS = 100
+
+# Потоки ASGI-воркера: каждый держит своё соединение с БД до CONN_MAX_AGE.
+# Число воркеров, умноженное на сумму потоков, должно оставаться меньше
+# max_connections Postgres с запасом для остальных клиентов.
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', default='8'))
+ASYNC_QUERY_THREADS = int(os.getenv('ASYNC_QUERY_THREADS', default='4'))
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_SLOW_REQUEST_THRESHOLD = float(
+    os.getenv('METRICS_SLOW_REQUEST_THRESHOLD', default=0.5)
+)
+METRICS_SLOW_REQUEST_TOP_QUERIES = 5
+METRICS_SLOW_REQUEST_SQL_LENGTH = 300
+
+
 STOP_WORD = ['me']
 SHOPPING_CART = 'cart.txt'
+TOKEN_CACHE_TIMEOUT = 60 * 5
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60
+SHOPPING_CART_CHUNK_SIZE = 500
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -142,4 +257,5 @@ DJOSER = {
         'user_list': ['rest_framework.permissions.AllowAny']
     },
     "HIDE_USERS": False,
+    "LOGOUT_ON_PASSWORD_CHANGE": True,
 }
@@ -0,0 +1,18 @@
+import os
+import shutil
+
+METRICS_DIR = os.environ.setdefault('METRICS_DIR', '/tmp/foodgram_metrics')
+
+
+def on_starting(server):
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Снимок метрик завершившегося воркера больше не суммируется."""
+    for name in (f'{worker.pid}.json', f'.{worker.pid}.json.tmp'):
+        try:
+            os.remove(os.path.join(METRICS_DIR, name))
+        except FileNotFoundError:
+            pass
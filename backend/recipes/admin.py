@@ -17,17 +17,18 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'cooking_time',
         'pub_date',
-        'added_to_favorites_amount'
-
+        'added_to_favorites_amount',
+        'in_carts_count'
     )
     list_filter = ('name', 'author', 'tags', 'pub_date', 'cooking_time')
     readonly_fields = ('added_to_favorites_amount',)
     empty_value_display = '-пусто-'
 
     def added_to_favorites_amount(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     added_to_favorites_amount.short_description = 'Добавлений в избранное'
+    added_to_favorites_amount.admin_order_field = 'favorites_count'
 
 
 @admin.register(Ingredient)
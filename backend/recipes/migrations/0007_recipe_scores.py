@@ -0,0 +1,117 @@
+# Generated by Django 3.2 on 2026-10-18 04:25
+
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+import django.utils.timezone
+
+BATCH_SIZE = 1000
+
+
+def backfill_created(apps, schema_editor):
+    """Старым добавлениям ставится дата публикации рецепта.
+
+    Иначе все они получили бы время миграции и считались бы свежими
+    в окне trending.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    pub_date = Subquery(Recipe.objects.filter(
+        pk=OuterRef('recipe_id')).values('pub_date')[:1])
+    for model_name in ('Favorite', 'ShoppingCard'):
+        apps.get_model('recipes', model_name).objects.update(
+            created=pub_date)
+
+
+def get_trending(events, rate):
+    if not events:
+        return 0.0
+    terms = [math.log(weight) + rate * moment for weight, moment in events]
+    peak = max(terms)
+    return peak + math.log(sum(math.exp(term - peak) for term in terms))
+
+
+def fill_scores(apps, schema_editor):
+    """Оценки существующих рецептов, как после refresh_recipe_scores."""
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    ShoppingCard = apps.get_model('recipes', 'ShoppingCard')
+    rate = math.log(2) / (settings.RECIPE_TRENDING_HALF_LIFE_HOURS * 3600)
+    weights = (
+        (Favorite, settings.RECIPE_SCORE_FAVORITE_WEIGHT),
+        (ShoppingCard, settings.RECIPE_SCORE_CART_WEIGHT),
+    )
+    refreshed_at = django.utils.timezone.now()
+    recipes = list(Recipe.objects.order_by('pk').values_list(
+        'pk', 'favorites_count', 'in_carts_count'))
+    for start in range(0, len(recipes), BATCH_SIZE):
+        batch = recipes[start:start + BATCH_SIZE]
+        events = defaultdict(list)
+        for model, weight in weights:
+            for recipe_id, created in model.objects.filter(
+                    recipe_id__in=[pk for pk, _, _ in batch]).values_list(
+                        'recipe_id', 'created'):
+                events[recipe_id].append((weight, created.timestamp()))
+        RecipeScore.objects.bulk_create(
+            RecipeScore(
+                recipe_id=pk,
+                popular=(
+                    favorites_count * settings.RECIPE_SCORE_FAVORITE_WEIGHT
+                    + in_carts_count * settings.RECIPE_SCORE_CART_WEIGHT),
+                trending=get_trending(events[pk], rate),
+                favorites_count=favorites_count,
+                in_carts_count=in_carts_count,
+                refreshed_at=refreshed_at,
+            )
+            for pk, favorites_count, in_carts_count in batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe')),
+                ('popular', models.FloatField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Популярность с затуханием')),
+                ('favorites_count', models.PositiveIntegerField(default=0)),
+                ('in_carts_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(null=True, verbose_name='Дата пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Оценка рецепта',
+                'verbose_name_plural': 'Оценки рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcard',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created, migrations.RunPython.noop),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popular', '-recipe'], name='recipe_score_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending_idx'),
+        ),
+    ]
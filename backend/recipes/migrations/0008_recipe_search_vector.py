@@ -0,0 +1,52 @@
+# Generated by Django 3.2 on 2026-10-18 04:28
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CONFIGS = ('russian', 'english')
+SOURCES = (
+    ('recipe.name', 'A'),
+    ('recipe.text', 'B'),
+    ("coalesce((SELECT string_agg(ingredient.name, ' ') "
+     'FROM recipes_recipeingredient AS recipe_ingredient '
+     'JOIN recipes_ingredient AS ingredient '
+     'ON ingredient.id = recipe_ingredient.ingredient_id '
+     "WHERE recipe_ingredient.recipe_id = recipe.id), '')", 'C'),
+)
+SEARCH_VECTOR = ' || '.join(
+    f"setweight(to_tsvector('{config}', {source}), '{weight}')"
+    for config in CONFIGS for source, weight in SOURCES
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'UPDATE recipes_recipe AS recipe SET search_vector = {SEARCH_VECTOR}')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx '
+        'ON recipes_recipe USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
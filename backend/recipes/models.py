@@ -1,10 +1,18 @@
+from core.models import MaintainedFieldsMixin
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db import connections, models
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, Window
+from django.db.models.functions import RowNumber
 
 User = get_user_model()
 
+SCORE_ORDERINGS = {
+    'popular': ('-score__popular', '-id'),
+    'trending': ('-score__trending', '-id'),
+}
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -86,12 +94,33 @@ class Ingredient(models.Model):
                 f'Единица измерения: {self.measurement_unit}')
 
 
+def get_read_prefetches():
+    return (
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    )
+
+
 class RecipeQuerySet(models.QuerySet):
     def filter_by_tags(self, tags):
         if tags:
-            return self.filter(tags__slug__in=tags).distinct()
+            return self.filter(Exists(TagRecipe.objects.filter(
+                recipe_id=OuterRef('pk'), tag__slug__in=tags)))
         return self
 
+    def filter_favorited(self, user_id, value=True):
+        favorited = Exists(Favorite.objects.filter(
+            user_id=user_id, recipe_id=OuterRef('pk')))
+        return self.filter(favorited if value else ~favorited)
+
+    def filter_in_shopping_cart(self, user_id, value=True):
+        in_shopping_cart = Exists(ShoppingCard.objects.filter(
+            user_id=user_id, recipe_id=OuterRef('pk')))
+        return self.filter(in_shopping_cart if value else ~in_shopping_cart)
+
     def add_user_annotations(self, user_id):
         return self.annotate(
             is_favorited=Exists(
@@ -103,14 +132,83 @@ class RecipeQuerySet(models.QuerySet):
                 ShoppingCard.objects.filter(
                     user_id=user_id, recipe__pk=OuterRef('pk'))
             ),
-            in_shopping_cart=Exists(
-                ShoppingCard.objects.filter(
-                    user_id=user_id, recipe__pk=OuterRef('pk'))
+            author_is_subscribed=Exists(
+                Follow.objects.filter(
+                    user_id=user_id, author_id=OuterRef('author_id'))
             )
         )
 
-
-class Recipe(models.Model):
+    def latest_by_authors(self, author_ids, limit=None):
+        """Последние рецепты каждого автора одним оконным запросом."""
+        if not author_ids:
+            return self.none()
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()]
+            )
+        ).order_by()
+        sql, params = ranked.query.sql_with_params()
+        query = f'SELECT * FROM ({sql}) AS ranked'
+        if limit is not None:
+            query += ' WHERE ranked.row_number <= %s'
+            params = (*params, limit)
+        return self.raw(f'{query} ORDER BY ranked.row_number', params)
+
+    def filter_followed(self, user_id):
+        return self.filter(Exists(Follow.objects.filter(
+            user_id=user_id, author_id=OuterRef('author_id'))))
+
+    def feed(self, user_id, limit, position=None):
+        """Страница ленты подписок после позиции (pub_date, id).
+
+        В PostgreSQL каждая подписка даёт не больше ``limit`` рецептов
+        через LATERAL по индексу (author, -pub_date, -id), и объединяются
+        только эти короткие списки, а не все рецепты авторов.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            recipes = self.filter_followed(user_id).order_by(
+                '-pub_date', '-id')
+            if position is not None:
+                pub_date, pk = position
+                recipes = recipes.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+            return list(recipes[:limit])
+        bound = ''
+        params = []
+        if position is not None:
+            bound = 'AND (recipe.pub_date, recipe.id) < (%s, %s)'
+            params.extend(position)
+        sql = f'''
+            SELECT feed.id FROM {Follow._meta.db_table} AS follow
+            CROSS JOIN LATERAL (
+                SELECT recipe.id, recipe.pub_date
+                FROM {Recipe._meta.db_table} AS recipe
+                WHERE recipe.author_id = follow.author_id {bound}
+                ORDER BY recipe.pub_date DESC, recipe.id DESC
+                LIMIT %s
+            ) AS feed
+            WHERE follow.user_id = %s
+            ORDER BY feed.pub_date DESC, feed.id DESC
+            LIMIT %s
+        '''
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [*params, limit, user_id, limit])
+            ids = [row[0] for row in cursor.fetchall()]
+        recipes = self.in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+    def order_by_score(self, ordering):
+        return self.filter(score__isnull=False).select_related(
+            'score').order_by(*SCORE_ORDERINGS[ordering])
+
+    def with_read_relations(self):
+        return self.select_related('author').prefetch_related(
+            *get_read_prefetches())
+
+
+class Recipe(MaintainedFieldsMixin, models.Model):
     name = models.CharField(
         max_length=200,
         verbose_name='Название рецепта'
@@ -137,13 +235,39 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         db_index=True
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
 
     objects = RecipeQuerySet.as_manager()
+    maintained_fields = ('favorites_count', 'in_carts_count', 'search_vector')
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_id_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['name', 'author'], name='unique_name_author_recip'
@@ -166,6 +290,10 @@ class Favorite(models.Model):
         related_name='favorites',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         verbose_name = 'Пользователь и избранный рецепт'
@@ -242,6 +370,10 @@ class ShoppingCard(models.Model):
         verbose_name='Список рецептов для пользователя',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         verbose_name = 'Пользователь и список покупок'
@@ -251,3 +383,42 @@ class ShoppingCard(models.Model):
                 fields=['user', 'recipe'], name='unique_user_recipe'
             )
         ]
+
+
+class RecipeScore(models.Model):
+    """Предрасчитанные оценки популярности рецепта.
+
+    ``trending`` хранится в логарифмической шкале от фиксированной эпохи,
+    поэтому оценки разных рецептов сравнимы без пересчёта затухания.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score'
+    )
+    popular = models.FloatField(
+        default=0,
+        verbose_name='Популярность'
+    )
+    trending = models.FloatField(
+        default=0,
+        verbose_name='Популярность с затуханием'
+    )
+    favorites_count = models.PositiveIntegerField(default=0)
+    in_carts_count = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(
+        null=True,
+        verbose_name='Дата пересчёта'
+    )
+
+    class Meta:
+        verbose_name = 'Оценка рецепта'
+        verbose_name_plural = 'Оценки рецептов'
+        indexes = [
+            models.Index(fields=['-popular', '-recipe'],
+                         name='recipe_score_popular_idx'),
+            models.Index(fields=['-trending', '-recipe'],
+                         name='recipe_score_trending_idx'),
+        ]
@@ -6,6 +6,7 @@ User = get_user_model()
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'email', 'username', 'first_name', 'last_name')
+    list_display = ('pk', 'email', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count')
     search_fields = ('email', 'username', 'first_name', 'last_name')
     list_filter = ('username', 'email')
@@ -1,3 +1,4 @@
+from core.models import MaintainedFieldsMixin
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db import models
@@ -5,7 +6,7 @@ from django.db import models
 from .util import username_validator
 
 
-class User(AbstractUser):
+class User(MaintainedFieldsMixin, AbstractUser):
     first_name = models.CharField(
         max_length=150,
         verbose_name='Firstname'
@@ -25,6 +26,18 @@ class User(AbstractUser):
         unique=True,
         max_length=254
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    maintained_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ['date_joined']